@@ -0,0 +1,213 @@
+"""完整扫描周期基准测试：页面获取、解析、选种、.torrent 下载、添加、空间检查和开始任务
+
+对接进程内的模拟站点和模拟 qBittorrent，按不同的客户端任务数和候选种子数运行，
+输出各阶段耗时分位数、每周期 API 调用次数和内存峰值。
+
+用法：
+    python -m bench.cycle_bench
+    python -m bench.cycle_bench --torrents 100 1000 10000 --candidates 5 20 --cycles 10
+    python -m bench.cycle_bench --html saved/*.html --latency 0.02
+    python -m bench.cycle_bench --rss
+
+--rss 时通过模拟站点的 RSS 订阅获取种子（SCAN_MODE=rss），page fetch 阶段为订阅的条件请求。
+
+内存峰值由 tracemalloc 统计（Python 堆）；max RSS 为整个进程的常驻内存峰值。
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+from bench.fake_qbittorrent import FakeQBittorrent
+from bench.fake_site import FakeSite
+from byr.parser import PageCache
+from byr.seen import SeenIndex
+
+STAGES = ('space check', 'page fetch', 'parse', 'capacity', 'selection', 'torrent fetch', 'add', 'start', 'cycle')
+
+
+class _Login:
+    """跳过浏览器登录的 LoginTool 替身"""
+    browser = None
+    tab = None
+    logout_url = ''
+
+    def login(self):
+        return object()
+
+    def retry_login(self):
+        return self.login()
+
+    def get_cookies(self):
+        return []
+
+    def logout(self):
+        return True
+
+    def close(self):
+        pass
+
+    def clear_browser(self):
+        pass
+
+
+def _timed(timings, stage, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[stage].append((time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def _reset_scanner(bot, timings):
+    # 每个周期从空缓存开始，保证页面（或订阅）中的种子都算作新种子
+    if hasattr(bot.scanner, 'cache'):
+        bot.scanner.cache = PageCache()
+        bot.scanner.cache.parse = _timed(timings, 'parse', bot.scanner.cache.parse)
+    else:
+        bot.scanner.etag = bot.scanner.last_modified = None
+        bot.scanner._listings = list()
+
+
+async def run_cycles(bot, site, fake, cycles, timings):
+    for cycle in range(cycles):
+        # 每个周期使用新的已处理索引和新的 infohash，保证候选种子都会走完整流程
+        site.refresh()
+        bot.seen.close()
+        bot.seen = SeenIndex(path=f'./data/seen-{cycle}.db')
+        bot.eviction_planner.promo_lookup = bot.seen.promo_of
+        _reset_scanner(bot, timings)
+        bot.scheduler.request_space_check('bench')
+
+        # 与常驻运行相同的路径：扫描周期、选种分发、等待添加完成，再按客户端余量开始排队的任务
+        started = time.perf_counter()
+        listings, delay = await bot._scan_cycle()
+        if delay is None:
+            raise RuntimeError('Scan cycle stopped')
+        if listings:
+            await bot._dispatch(listings)
+        while bot._downloads:
+            await asyncio.gather(*bot._downloads)
+        await bot._pump_starts()
+        timings['cycle'].append((time.perf_counter() - started) * 1000)
+        # 周期之间模拟客户端运行 10 分钟，部分下载完成后空出下载名额
+        fake.advance(600)
+
+
+def run(client_torrents, candidates, args, pages):
+    from byr.bot import Bot
+    from byr.client.qbittorrent import QBittorrent
+
+    timings = defaultdict(list)
+    # 每组配置使用独立的数据目录
+    os.chdir(tempfile.mkdtemp(prefix=f'{client_torrents}-{candidates}-', dir=args.workdir))
+    with FakeQBittorrent(latency=args.latency) as fake, \
+            FakeSite(pages=pages, rows=args.rows, latency=args.latency) as site:
+        # 已有任务都已完成，开始队列有空余的下载名额
+        fake.seed(client_torrents, completed_ratio=1.0)
+        os.environ.update({
+            'QBITTORRENT_HOST': fake.url,
+            'QBITTORRENT_USERNAME': fake.username,
+            'QBITTORRENT_PASSWORD': fake.password,
+            'MAX_TORRENTS_SIZE': str(fake.capacity // 1024 ** 3),
+            'SCAN_MODE': 'rss' if args.rss else 'http',
+            'RSS_URL': f'{site.url}torrentrss.php?rows=50&linktype=dl&passkey={site.passkey}',
+        })
+
+        tracemalloc.start()
+        client = QBittorrent()
+        bot = Bot(_Login(), client)
+        bot.base_url = site.url
+        bot.page = True  # 跳过登录
+        bot.torrent_url = bot._get_url('torrents.php')
+        if not args.rss:
+            bot.scanner.base_url = site.url
+            bot.scanner.max_pages = len(site.pages)
+        bot.ranker.max_count = candidates
+
+        # 按阶段计时
+        bot.check_free_space = _timed(timings, 'space check', bot.check_free_space)
+        if args.rss:
+            bot.scanner.scan = _timed(timings, 'page fetch', bot.scanner.scan)
+        else:
+            bot.site.get_html = _timed(timings, 'page fetch', bot.site.get_html)
+        bot._selection_capacity = _timed(timings, 'capacity', bot._selection_capacity)
+        bot.find_appropriate_torrents = _timed(timings, 'selection', bot.find_appropriate_torrents)
+        bot._fetch_torrent = _timed(timings, 'torrent fetch', bot._fetch_torrent)
+        client.add_many = _timed(timings, 'add', client.add_many)
+        client.start_many = _timed(timings, 'start', client.start_many)
+
+        calls_before = fake.calls + site.calls
+        try:
+            asyncio.run(run_cycles(bot, site, fake, args.cycles, timings))
+        finally:
+            bot.__exit__(None, None, None)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        calls = fake.calls + site.calls
+        calls.subtract(calls_before)
+    return timings, +calls, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark a full scan/select/add cycle.')
+    parser.add_argument('--torrents', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='torrents already in the client')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[5, 20], help='max torrents picked per cycle')
+    parser.add_argument('--cycles', type=int, default=5, help='cycles per configuration')
+    parser.add_argument('--html', nargs='*', help='saved torrents.php pages')
+    parser.add_argument('--rows', type=int, default=100, help='rows per generated page')
+    parser.add_argument('--rss', action='store_true', help='ingest torrents from the RSS feed')
+    parser.add_argument('--latency', type=float, default=0.0, help='extra latency per request (seconds)')
+    parser.add_argument('--verbose', action='store_true', help='show bot logs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    pages = [Path(path).read_bytes() for path in args.html] if args.html else None
+
+    workdir = tempfile.TemporaryDirectory(prefix='byr-bench-')
+    args.workdir = workdir.name
+    for client_torrents in args.torrents:
+        for candidates in args.candidates:
+            timings, calls, peak = run(client_torrents, candidates, args, pages)
+            print(f"\n== {client_torrents} client torrents, up to {candidates} candidates, {args.cycles} cycles ==")
+            print(f"{'stage':<14} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+            for stage in STAGES:
+                values = timings.get(stage, [])
+                if not values:
+                    continue
+                print(f"{stage:<14} {len(values):>6} {percentile(values, 50):>9.2f} {percentile(values, 90):>9.2f} "
+                      f"{percentile(values, 99):>9.2f} {max(values):>9.2f}")
+            per_cycle = ', '.join(f'{path} {count / args.cycles:.1f}' for path, count in sorted(calls.items()))
+            print(f"API calls per cycle: {per_cycle}")
+            print(f"Peak traced memory: {peak / 1024 ** 2:.1f} MiB")
+
+    os.chdir(Path(workdir.name).parent)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KiB 为单位，macOS 以字节为单位
+    print(f"\nMax RSS: {rss / 1024 ** (2 if sys.platform == 'darwin' else 1):.1f} MiB")
+    workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
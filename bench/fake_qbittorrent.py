@@ -0,0 +1,386 @@
+"""进程内的 qBittorrent Web API v2 模拟服务，供基准测试和本地调试使用
+
+实现 byr/client/qbittorrent.py 用到的接口：auth、app 版本、torrents/info、torrents/add、
+torrents/delete、torrents/start(resume)、标签以及带 rid 增量的 sync/maindata。
+可预置上万个任务，模拟磁盘空间、下载进度、请求延迟和错误。
+
+用法：
+    with FakeQBittorrent(capacity=32 * 1024 ** 4) as fake:
+        fake.seed(10_000)
+        client = qbittorrentapi.Client(host=fake.url, username='admin', password='adminadmin')
+"""
+import bisect
+import hashlib
+import json
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from byr.bencode import BencodeError, encode, parse_torrent
+
+# 增量历史最多保留的变更条数，更早的 rid 返回全量数据
+_HISTORY_LIMIT = 100_000
+_DOWNLOADING_STATES = frozenset({'downloading', 'stalledDL', 'metaDL', 'queuedDL'})
+
+
+class FakeQBittorrent:
+    def __init__(self, capacity=32 * 1024 ** 4, username='admin', password='adminadmin',
+                 latency=0.0, error_rate=0.0, download_rate=50 * 1024 ** 2, seed=0):
+        self.capacity = capacity  # 模拟磁盘总容量（字节）
+        self.username = username
+        self.password = password
+        self.latency = latency  # 每个请求的额外延迟（秒），可为 (最小, 最大)
+        self.error_rate = error_rate  # 请求随机返回 500 的概率
+        self.fail_paths = dict()  # 路径 -> 状态码，命中时直接返回该错误
+        self.download_rate = download_rate  # advance() 时每个下载中任务的速度（字节/秒）
+        self.calls = Counter()  # 路径 -> 请求次数
+
+        self.torrents = dict()  # hash -> 字段
+        self.tags = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sessions = set()
+        self._rid = 0
+        self._changes = list()  # (rid, hash, 字段名集合)；字段为 None 表示任务被删除
+        self._server = None
+        self._thread = None
+
+    # -- 生命周期 --
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        handler = type('Handler', (_Handler,), {'fake': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # -- 数据准备 --
+
+    def seed(self, count, min_size=256 * 1024 ** 2, max_size=4 * 1024 ** 3, completed_ratio=0.9):
+        """批量生成任务，返回其哈希列表"""
+        now = int(time.time())
+        hashes = list()
+        with self._lock:
+            for i in range(count):
+                torrent_hash = self._rng.getrandbits(160).to_bytes(20, 'big').hex()
+                size = self._rng.randint(min_size, max_size)
+                done = self._rng.random() < completed_ratio
+                self._put(torrent_hash, {
+                    'name': f'seeded-{i}',
+                    'size': size,
+                    'total_size': size,
+                    'downloaded': size if done else 0,
+                    'amount_left': 0 if done else size,
+                    'progress': 1.0 if done else 0.0,
+                    'state': 'stalledUP' if done else 'downloading',
+                    'uploaded': self._rng.randint(0, size * 3),
+                    'upspeed': self._rng.choice((0, 0, 0, self._rng.randint(1, 2 * 1024 ** 2))),
+                    'dlspeed': 0,
+                    'num_seeds': self._rng.randint(0, 50),
+                    'num_leechs': self._rng.randint(0, 20),
+                    'num_complete': self._rng.randint(1, 200),
+                    'num_incomplete': self._rng.randint(0, 100),
+                    'added_on': now - self._rng.randint(0, 90 * 86400),
+                    'save_path': '/downloads',
+                    'tags': '',
+                    'category': '',
+                })
+                hashes.append(torrent_hash)
+        return hashes
+
+    def advance(self, seconds):
+        """推进模拟时间：下载中的任务按 download_rate 增加进度，做种任务按 upspeed 增加上传量"""
+        with self._lock:
+            for torrent_hash, fields in self.torrents.items():
+                changed = {'uploaded': fields['uploaded'] + int(fields['upspeed'] * seconds)}
+                if fields['state'] in _DOWNLOADING_STATES:
+                    downloaded = min(fields['size'], fields['downloaded'] + int(self.download_rate * seconds))
+                    changed['downloaded'] = downloaded
+                    changed['amount_left'] = fields['size'] - downloaded
+                    changed['progress'] = downloaded / fields['size'] if fields['size'] else 1.0
+                    changed['dlspeed'] = self.download_rate
+                    if downloaded >= fields['size']:
+                        changed['state'] = 'stalledUP'
+                        changed['dlspeed'] = 0
+                self._update(torrent_hash, changed)
+
+    @property
+    def free_space(self):
+        used = sum(fields['downloaded'] for fields in self.torrents.values())
+        return max(0, self.capacity - used)
+
+    # -- 内部状态 --
+
+    def _record(self, torrent_hash, fields):
+        self._rid += 1
+        self._changes.append((self._rid, torrent_hash, fields))
+        if len(self._changes) > _HISTORY_LIMIT:
+            del self._changes[:len(self._changes) - _HISTORY_LIMIT]
+
+    def _put(self, torrent_hash, fields):
+        self.torrents[torrent_hash] = fields
+        self._record(torrent_hash, set(fields))
+
+    def _update(self, torrent_hash, changed):
+        fields = self.torrents[torrent_hash]
+        changed = {k: v for k, v in changed.items() if fields.get(k) != v}
+        if changed:
+            fields.update(changed)
+            self._record(torrent_hash, set(changed))
+
+    def _remove(self, torrent_hash):
+        if self.torrents.pop(torrent_hash, None) is not None:
+            self._record(torrent_hash, None)
+
+    def _info(self, torrent_hash, fields):
+        return dict(fields, hash=torrent_hash)
+
+    def maindata(self, rid):
+        with self._lock:
+            server_state = {
+                'free_space_on_disk': self.free_space,
+                'connection_status': 'connected',
+                'dl_info_speed': sum(fields['dlspeed'] for fields in self.torrents.values()),
+                'dl_rate_limit': 0,
+            }
+            oldest = self._changes[0][0] if self._changes else self._rid + 1
+            if rid <= 0 or rid > self._rid or rid < oldest - 1:
+                return {
+                    'rid': self._rid,
+                    'full_update': True,
+                    'torrents': {h: dict(fields) for h, fields in self.torrents.items()},
+                    'tags': sorted(self.tags),
+                    'server_state': server_state,
+                }
+
+            torrents = dict()
+            removed = set()
+            start = bisect.bisect_right(self._changes, rid, key=lambda change: change[0])
+            for _, torrent_hash, names in self._changes[start:]:
+                if names is None:
+                    torrents.pop(torrent_hash, None)
+                    removed.add(torrent_hash)
+                    continue
+                removed.discard(torrent_hash)
+                fields = self.torrents.get(torrent_hash)
+                if fields is not None:
+                    delta = torrents.setdefault(torrent_hash, dict())
+                    delta.update({name: fields[name] for name in names if name in fields})
+            data = {'rid': self._rid, 'server_state': server_state}
+            if torrents:
+                data['torrents'] = torrents
+            if removed:
+                data['torrents_removed'] = sorted(removed)
+            return data
+
+    def add(self, files, form):
+        paused = form.get('paused', form.get('stopped', 'false')).lower() == 'true'
+        tags = [t for t in form.get('tags', '').split(',') if t]
+        added = list()
+        with self._lock:
+            for content in files:
+                try:
+                    meta = parse_torrent(content)
+                except BencodeError:
+                    continue
+                if meta.hash in self.torrents:
+                    continue
+                self._put(meta.hash, {
+                    'name': meta.name,
+                    'size': meta.total_size,
+                    'total_size': meta.total_size,
+                    'downloaded': 0,
+                    'amount_left': meta.total_size,
+                    'progress': 0.0,
+                    'state': 'stoppedDL' if paused else 'downloading',
+                    'uploaded': 0,
+                    'upspeed': 0,
+                    'dlspeed': 0,
+                    'num_seeds': 0,
+                    'num_leechs': 0,
+                    'num_complete': 0,
+                    'num_incomplete': 0,
+                    'added_on': int(time.time()),
+                    'save_path': form.get('savepath', '/downloads'),
+                    'tags': ','.join(tags),
+                    'category': form.get('category', ''),
+                })
+                self.tags.update(tags)
+                added.append(meta.hash)
+        return added
+
+    def _select(self, hashes):
+        if hashes == 'all':
+            return list(self.torrents)
+        return [h for h in hashes.split('|') if h in self.torrents]
+
+    def start_torrents(self, hashes):
+        with self._lock:
+            for torrent_hash in self._select(hashes):
+                fields = self.torrents[torrent_hash]
+                if fields['state'] in ('stoppedDL', 'pausedDL'):
+                    self._update(torrent_hash, {'state': 'downloading'})
+                elif fields['state'] in ('stoppedUP', 'pausedUP'):
+                    self._update(torrent_hash, {'state': 'stalledUP'})
+
+    def delete(self, hashes):
+        with self._lock:
+            for torrent_hash in self._select(hashes):
+                self._remove(torrent_hash)
+
+    def add_tags(self, hashes, tags):
+        tags = [t for t in tags.split(',') if t]
+        with self._lock:
+            self.tags.update(tags)
+            for torrent_hash in self._select(hashes):
+                current = [t for t in self.torrents[torrent_hash]['tags'].split(',') if t]
+                merged = current + [t for t in tags if t not in current]
+                self._update(torrent_hash, {'tags': ','.join(merged)})
+
+    def info(self, query):
+        with self._lock:
+            hashes = query.get('hashes')
+            selected = self._select(hashes) if hashes else list(self.torrents)
+            result = [self._info(h, self.torrents[h]) for h in selected]
+        status = query.get('filter')
+        if status == 'completed':
+            result = [t for t in result if t['progress'] >= 1]
+        elif status == 'downloading':
+            result = [t for t in result if t['state'] in _DOWNLOADING_STATES]
+        return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None  # 由 FakeQBittorrent.start 注入
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _send(self, status, body=b'', content_type='text/plain; charset=UTF-8', headers=None):
+        if isinstance(body, str):
+            body = body.encode()
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+            content_type = 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_form(self):
+        url = urlsplit(self.path)
+        form = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        files = list()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser().parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+            for part in message.get_payload():
+                payload = part.get_payload(decode=True) or b''
+                if part.get_filename() is not None:
+                    files.append(payload)
+                else:
+                    form[part.get_param('name', header='content-disposition')] = payload.decode()
+        elif body:
+            form.update({k: v[-1] for k, v in parse_qs(body.decode()).items()})
+        return url.path, form, files
+
+    def _authorized(self):
+        cookie = self.headers.get('Cookie', '')
+        sid = next((c.split('=', 1)[1] for c in cookie.split('; ') if c.startswith('SID=')), None)
+        return sid in self.fake._sessions
+
+    def _dispatch(self):
+        fake = self.fake
+        path, form, files = self._read_form()
+        fake.calls[path] += 1
+
+        latency = fake.latency
+        if isinstance(latency, tuple):
+            latency = fake._rng.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        if path in fake.fail_paths:
+            return self._send(fake.fail_paths[path], 'Simulated error')
+        if fake.error_rate and fake._rng.random() < fake.error_rate:
+            return self._send(500, 'Simulated error')
+
+        if path == '/api/v2/auth/login':
+            if form.get('username') != fake.username or form.get('password') != fake.password:
+                return self._send(200, 'Fails.')
+            sid = secrets.token_hex(16)
+            fake._sessions.add(sid)
+            return self._send(200, 'Ok.', headers={'Set-Cookie': f'SID={sid}; HttpOnly; path=/'})
+        if path == '/api/v2/auth/logout':
+            return self._send(200)
+        if not self._authorized():
+            return self._send(403, 'Forbidden')
+
+        if path == '/api/v2/app/version':
+            return self._send(200, 'v5.0.4')
+        if path == '/api/v2/app/webapiVersion':
+            return self._send(200, '2.11.2')
+        if path == '/api/v2/sync/maindata':
+            return self._send(200, fake.maindata(int(form.get('rid', 0))))
+        if path == '/api/v2/torrents/info':
+            return self._send(200, fake.info(form))
+        if path == '/api/v2/torrents/add':
+            if not files and not form.get('urls'):
+                return self._send(415, 'Torrent file is not valid')
+            added = fake.add(files, form)
+            return self._send(200, 'Ok.' if added else 'Fails.')
+        if path in ('/api/v2/torrents/start', '/api/v2/torrents/resume'):
+            fake.start_torrents(form.get('hashes', ''))
+            return self._send(200)
+        if path == '/api/v2/torrents/delete':
+            fake.delete(form.get('hashes', ''))
+            return self._send(200)
+        if path == '/api/v2/torrents/addTags':
+            fake.add_tags(form.get('hashes', ''), form.get('tags', ''))
+            return self._send(200)
+        if path == '/api/v2/torrents/tags':
+            return self._send(200, sorted(fake.tags))
+        return self._send(404, 'Not Found')
+
+
+def make_torrent(name, size, piece_length=4 * 1024 ** 2, comment=''):
+    """生成单文件种子内容（pieces 为占位数据）"""
+    # 大文件使用更大的分块，控制种子体积
+    piece_length = max(piece_length, 1 << max(0, (size // 2048).bit_length()))
+    pieces = hashlib.sha1(name.encode()).digest() * max(1, -(-size // piece_length))
+    info = {'name': name, 'length': size, 'piece length': piece_length, 'pieces': pieces}
+    return encode({'announce': 'http://127.0.0.1/announce', 'comment': comment, 'info': info})
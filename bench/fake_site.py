@@ -0,0 +1,182 @@
+"""进程内的 byr.pt 模拟站点：提供种子列表页面、RSS 订阅和 .torrent 下载，供基准测试使用
+
+页面可以是生成的（bench.fixtures）或保存的真实页面。下载的种子大小与列表中一致，
+每次调用 refresh() 后同一种子 ID 会生成新的 infohash，便于重复运行完整的添加流程。
+RSS 订阅（torrentrss.php）包含页面中的促销种子，支持 ETag 和 If-Modified-Since 条件请求。
+require_login=True 时没有登录 Cookie（cookies）的页面和下载请求会被重定向到 login.php，用于测试登录流程。
+"""
+import hashlib
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench.fake_qbittorrent import make_torrent
+from bench.fixtures import make_torrents_page
+from byr.parser import parse_page
+
+
+class FakeSite:
+    def __init__(self, pages=None, rows=100, page_count=3, style='highlight', promo_ratio=0.3,
+                 latency=0.0, seed=0, require_login=False):
+        if pages is None:
+            pages = [make_torrents_page(rows, style, promo_ratio, first_id=400000 - i * rows, seed=seed + i)
+                     for i in range(page_count)]
+        self.pages = [page.encode() if isinstance(page, str) else page for page in pages]
+        self.latency = latency  # 每个请求的额外延迟（秒），可为 (最小, 最大)
+        self.calls = Counter()  # 路径 -> 请求次数
+        self.generation = 0
+        self._rng = random.Random(seed)
+        self._sizes = dict()  # seed_id -> 大小
+        self.listings = list()  # 页面中的促销种子，按页面顺序
+        for page in self.pages:
+            _, listings = parse_page(page.decode())
+            self.listings.extend(listings)
+            self._sizes.update((listing.seed_id, max(listing.size, 1024 ** 2)) for listing in listings)
+        self.passkey = 'bench'
+        self.require_login = require_login
+        self.session_cookie = ('c_secure_pass', 'bench-session')  # 登录后浏览器得到的 Cookie
+        self._server = None
+        self._feed = None  # (内容, ETag, Last-Modified 时间戳)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        handler = type('Handler', (_Handler,), {'site': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def cookies(self):
+        """与 DrissionPage 返回格式相同的登录 Cookie"""
+        name, value = self.session_cookie
+        return [{'name': name, 'value': value, 'domain': '127.0.0.1', 'path': '/'}]
+
+    def refresh(self):
+        """之后下载的种子使用新的 infohash"""
+        self.generation += 1
+
+    def set_listings(self, listings):
+        """替换订阅内容，之后的请求会得到新的 ETag"""
+        self.listings = list(listings)
+        self._sizes.update((listing.seed_id, max(listing.size, 1024 ** 2)) for listing in self.listings)
+        self._feed = None
+
+    def feed(self):
+        """返回 (RSS 内容, ETag, Last-Modified 时间戳)"""
+        if self._feed is None:
+            items = []
+            for listing in self.listings:
+                size = self._sizes[listing.seed_id]
+                items.append(
+                    f'<item><title>[{escape(listing.promo.value)}] {escape(listing.title)} [{size / 1024 ** 3:.2f} GB]</title>'
+                    f'<link>{self.url}details.php?id={listing.seed_id}</link>'
+                    f'<category>{escape(listing.cat)}</category>'
+                    f'<enclosure url="{self.url}download.php?id={listing.seed_id}&amp;passkey={self.passkey}" '
+                    f'length="{size}" type="application/x-bittorrent" />'
+                    f'<guid isPermaLink="false">{listing.seed_id}</guid></item>'
+                )
+            body = ('<?xml version="1.0" encoding="utf-8"?>\n<rss version="2.0"><channel>'
+                    '<title>BYRBT Torrents</title>' + ''.join(items) + '</channel></rss>').encode()
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            self._feed = (body, etag, int(time.time()))
+        return self._feed
+
+    def torrent(self, seed_id):
+        size = self._sizes.get(seed_id)
+        if size is None:
+            return None
+        return make_torrent(f'{seed_id}-{self.generation}', size, comment=f'https://byr.pt/details.php?id={seed_id}')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site = None  # 由 FakeSite.start 注入
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        site = self.site
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        site.calls[url.path] += 1
+
+        latency = site.latency
+        if isinstance(latency, tuple):
+            latency = site._rng.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+        if url.path == '/login.php':
+            return self._send(200, b'<html><form action="takelogin.php"></form></html>', 'text/html; charset=utf-8')
+        # 订阅和带 passkey 的下载链接不需要登录
+        if site.require_login and 'passkey' not in query and not self._logged_in():
+            return self._send(302, b'', 'text/html', (('Location', '/login.php'),))
+        if url.path in ('/', '/index.php'):
+            return self._send(200, b'<html>index</html>', 'text/html; charset=utf-8')
+        if url.path == '/torrents.php':
+            page = int(query.get('page', 0))
+            if page >= len(site.pages):
+                return self._send(200, site.pages[-1], 'text/html; charset=utf-8')
+            return self._send(200, site.pages[page], 'text/html; charset=utf-8')
+        if url.path == '/torrentrss.php':
+            if query.get('passkey') != site.passkey:
+                return self._send(403, b'Invalid passkey', 'text/plain')
+            body, etag, modified = site.feed()
+            headers = (('ETag', etag), ('Last-Modified', formatdate(modified, usegmt=True)))
+            if self.headers.get('If-None-Match') == etag or self._not_modified_since(modified):
+                return self._send(304, b'', 'application/xml', headers)
+            return self._send(200, body, 'application/xml; charset=utf-8', headers)
+        if url.path == '/download.php':
+            content = site.torrent(query.get('id', ''))
+            if content is None:
+                return self._send(404, b'Not Found', 'text/plain')
+            return self._send(200, content, 'application/x-bittorrent')
+        if url.path == '/logout.php':
+            return self._send(200, b'', 'text/html')
+        return self._send(404, b'Not Found', 'text/plain')
+
+    def _logged_in(self):
+        name, value = self.site.session_cookie
+        cookies = (self.headers.get('Cookie') or '').split('; ')
+        return f'{name}={value}' in cookies
+
+    def _not_modified_since(self, modified):
+        since = self.headers.get('If-Modified-Since')
+        if since is None or self.headers.get('If-None-Match') is not None:
+            return False
+        try:
+            return modified <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
@@ -0,0 +1,94 @@
+"""生成与 byr.pt 种子列表结构一致的页面，供基准测试使用"""
+import random
+from html import escape
+
+# 控制面板中三种促销标记方式
+PROMO_STYLES = ('highlight', 'tag', 'icon')
+
+# (高亮 class, 文字标记 class, 图标 class)
+_PROMOS = [
+    ('free_bg', 'free', 'pro_free'),
+    ('twoupfree_bg', 'twoupfree', 'pro_free2up'),
+    ('twoup_bg', 'twoup', 'pro_2up'),
+    ('halfdown_bg', 'halfdown', 'pro_50pctdown'),
+    ('thirtypercentdown_bg', 'thirtypercentdown', 'pro_30pctdown'),
+]
+_CATEGORIES = ['电影', '剧集', '动漫', '音乐', '综艺', '游戏', '软件', '资料', '体育', '记录']
+# (单位, 最小值, 最大值)
+_SIZES = [('MiB', 100, 1000), ('GiB', 1, 100), ('GiB', 1, 100), ('GiB', 100, 1000), ('TiB', 1, 3)]
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>BYRBT :: 种子</title></head>
+<body>
+<div id="info_block"><div class="navbar-user-data">
+<span class="nowrap"><a href="userdetails.php?id=1"><b>{user}</b></a></span>
+[<a href="logout.php">退出</a>] 等级: 用户 &nbsp; 魔力值: 12,345.6 [使用]
+分享率: 3.210 上传量: 12.34 TiB 下载量: 3.84 TiB
+当前活动: 12 / 0
+</div></div>
+<table class="torrents" cellspacing="0" cellpadding="5" width="100%">
+<tr><td class="colhead">引用</td><td class="colhead">类型</td><td class="colhead">标题</td>
+<td class="colhead">评论</td><td class="colhead">存活</td><td class="colhead">大小</td>
+<td class="colhead">种子</td><td class="colhead">下载</td><td class="colhead">完成</td>
+<td class="colhead">发布者</td></tr>
+"""
+
+_PAGE_TAIL = """</table>
+<table class="main" width="100%"><tr><td class="embedded">页脚</td></tr></table>
+</body></html>
+"""
+
+
+def _row(rng, seed_id, promo, style):
+    title = escape(f'Example.Torrent.{seed_id}.2160p.WEB-DL.H265-GROUP')
+    row_class = ''
+    tag_spans = []
+    icons = []
+    if rng.random() < 0.2:
+        tag_spans.append('<span class="hot">热门</span>')
+    if rng.random() < 0.3:
+        tag_spans.append('<span class="new">新</span>')
+    if promo is not None:
+        highlight, text, icon = promo
+        if style == 'highlight':
+            row_class = f' class="{highlight}"'
+        elif style == 'tag':
+            tag_spans.append(f'<span class="{text}">促销</span>')
+        else:
+            icons.append(f'<img class="{icon}" src="/pic/trans.gif" alt="promo" />')
+    if rng.random() < 0.1:
+        icons.append('<img src="/pic/seeding.png" alt="seeding" />')
+    unit, low, high = rng.choice(_SIZES)
+    size = f'{rng.uniform(low, high):.2f}<br />{unit}'
+    return (
+        f'<tr{row_class}>'
+        f'<td class="rowfollow"><input type="checkbox" /></td>'
+        f'<td class="rowfollow nowrap"><a href="?cat={rng.randint(401, 410)}">{rng.choice(_CATEGORIES)}</a></td>'
+        f'<td class="rowfollow" width="100%" align="left"><table class="torrentname" width="100%"><tr>'
+        f'<td class="embedded"><a title="{title}" href="details.php?id={seed_id}&amp;hit=1"><b>{title}</b></a>'
+        f'<span>{"".join(tag_spans)}</span>{"".join(icons)}<br />中文副标题 {seed_id}</td>'
+        f'<td class="embedded" width="20" align="center"><a href="download.php?id={seed_id}">'
+        f'<img class="download" src="/pic/trans.gif" alt="download" /></a></td>'
+        f'</tr></table></td>'
+        f'<td class="rowfollow">{rng.randint(0, 30)}</td>'
+        f'<td class="rowfollow nowrap"><span title="2025-01-01 00:00:00">{rng.randint(1, 59)}分钟</span></td>'
+        f'<td class="rowfollow">{size}</td>'
+        f'<td class="rowfollow" align="center">{rng.randint(0, 200)}</td>'
+        f'<td class="rowfollow" align="center">{rng.randint(0, 400)}</td>'
+        f'<td class="rowfollow">{rng.randint(0, 2000)}</td>'
+        f'<td class="rowfollow"><i>匿名</i></td>'
+        f'</tr>\n'
+    )
+
+
+def make_torrents_page(rows=100, style='highlight', promo_ratio=0.3, first_id=400000, seed=0):
+    """生成一页种子列表，种子 ID 从 first_id 开始递减"""
+    if style not in PROMO_STYLES:
+        raise ValueError(f'Unknown promo style: {style}')
+    rng = random.Random(seed)
+    parts = [_PAGE_HEAD.format(user='benchmark')]
+    for i in range(rows):
+        promo = rng.choice(_PROMOS) if rng.random() < promo_ratio else None
+        parts.append(_row(rng, first_id - i, promo, style))
+    parts.append(_PAGE_TAIL)
+    return ''.join(parts)
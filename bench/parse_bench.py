@@ -0,0 +1,92 @@
+"""种子列表解析基准测试：统计每页解析耗时和内存峰值
+
+用法：
+    python -m bench.parse_bench                      # 使用生成的页面
+    python -m bench.parse_bench --html saved/*.html  # 使用保存的 byr.pt 页面
+
+内存峰值由 tracemalloc 统计，只包含 Python 堆分配，不含 libxml2 在 C 层分配的内存。
+"""
+import argparse
+import re
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench.fixtures import PROMO_STYLES, make_torrents_page
+from byr.parser import get_tag, parse_page
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def legacy_parse(html):
+    # 旧版基于 BeautifulSoup 的实现，仅作为对照
+    soup = BeautifulSoup(html, 'html.parser')
+    user_data = soup.select_one('#info_block').select_one('.navbar-user-data').text
+    infos = []
+    for row in soup.find_all('tr', class_='free_bg') + soup.find_all('tr', class_='twoupfree_bg'):
+        tds = row.find_all('td', recursive=False)
+        main_td = tds[2]
+        href = main_td.find('a').attrs['href'].strip()
+        tags = set(font.attrs['class'][0] for font in main_td.select('span > span') if 'class' in font.attrs)
+        promo = ''
+        if len(main_td.select('img[src="/pic/trans.gif"][class^="pro_"]')) > 0:
+            promo = main_td.select('img[src="/pic/trans.gif"][class^="pro_"]')[-1].attrs['class'][0].split('_')[-1]
+        infos.append({
+            'seed_id': re.findall(r'id=(\d+)', href)[0],
+            'tag': get_tag(row.attrs['class'][0]),
+            'tags': tags,
+            'promo': promo,
+            'file_size': tds[5].text.strip(),
+        })
+    return user_data, infos
+
+
+def measure(parse, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(html)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    result = parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(timings), min(timings), peak
+
+
+def load_pages(args):
+    if args.html:
+        return [(Path(path).name, Path(path).read_text(encoding='utf-8')) for path in args.html]
+    return [(f'generated-{style}-{args.rows}', make_torrents_page(rows=args.rows, style=style))
+            for style in PROMO_STYLES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark torrent list parsing.')
+    parser.add_argument('--html', nargs='*', help='saved torrents.php pages')
+    parser.add_argument('--rows', type=int, default=100, help='rows per generated page')
+    parser.add_argument('--repeat', type=int, default=20, help='iterations per page')
+    args = parser.parse_args()
+
+    engines = [('lxml', lambda html: parse_page(html))]
+    if BeautifulSoup is not None:
+        engines.append(('bs4-legacy', legacy_parse))
+
+    print(f"{'page':<28} {'engine':<12} {'rows':>5} {'median ms':>10} {'min ms':>8} {'peak KiB':>9}")
+    for name, html in load_pages(args):
+        for engine, parse in engines:
+            if engine == 'bs4-legacy' and 'free_bg' not in html:
+                # 旧实现只识别高亮方式
+                continue
+            result, median_ms, min_ms, peak = measure(parse, html, args.repeat)
+            rows = len(result[1]) if isinstance(result, tuple) else len(result)
+            print(f"{name:<28} {engine:<12} {rows:>5} {median_ms:>10.2f} {min_ms:>8.2f} {peak / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
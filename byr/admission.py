@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from byr.client.qbittorrent import PAUSED_DL_STATES
+from byr.metrics import START_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceBudget:
+    """Bot 持有的空间预算：选中的种子在分发时即预留空间，添加到客户端后转为实际占用，
+    多次重叠的分发不会重复使用同一部分空间"""
+
+    def __init__(self, free_space):
+        self.free_space = free_space  # 剩余空间减去已添加但尚未下载完的部分
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.free_space - self.reserved
+
+    def fits(self, size):
+        return size <= self.available
+
+    def reserve(self, size, margin=0):
+        """预留空间，预留后剩余不足 margin 时返回 False"""
+        with self._lock:
+            if not self.fits(size + margin):
+                return False
+            self.reserved += size
+            return True
+
+    def hold(self, size):
+        """不检查余量直接预留（例如选种时计入了可清理空间的种子），不足的部分在准入时清理"""
+        with self._lock:
+            self.reserved += size
+
+    def release(self, size):
+        """归还预留的空间（例如添加到客户端失败时）"""
+        with self._lock:
+            self.reserved = max(0, self.reserved - size)
+
+    def commit(self, size):
+        """种子已添加到客户端：预留转为占用，直到下一次 refresh 从客户端取得新的余量"""
+        with self._lock:
+            self.reserved = max(0, self.reserved - size)
+            self.free_space -= size
+
+    def refresh(self, free_space):
+        """更新可用空间（例如清理种子之后），已有的预留保持不变"""
+        if free_space is not None:
+            with self._lock:
+                self.free_space = free_space
+
+
+class StartQueue:
+    """暂停添加的任务按优先级排队，客户端的下载任务数和下载速度有余量时才开始
+
+    同时开始的下载过多时所有任务都下载得很慢，可能在促销结束后才完成；排队后按优先级依次完成。
+    """
+
+    def __init__(self, client, max_active=4, bandwidth=0, saturation=0.85, listing_timeout=600):
+        self.client = client  # QBittorrent 或 ClientPool
+        self.max_active = max_active  # 每个客户端同时下载的任务数上限，0 表示添加后直接开始、不排队
+        self.bandwidth = bandwidth  # 下载带宽（字节/秒），0 表示使用客户端的全局下载限速
+        self.saturation = saturation  # 下载速度达到带宽的该比例时不再开始新任务
+        self.listing_timeout = listing_timeout  # 添加后一直没有出现在客户端列表中的任务在该时间（秒）后移出队列
+        self._heap = list()  # (负优先级, 序号, 入队时间, hash)
+        self._seq = itertools.count()
+        self._queued = set()  # 队列中的 hash，清理时跳过这些任务
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_active > 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, torrent_hash):
+        return torrent_hash in self._queued
+
+    def push(self, torrent_hash, priority=(0.0,)):
+        """将暂停的任务加入队列，priority 为数值元组，越大越先开始"""
+        with self._lock:
+            heapq.heappush(self._heap, (tuple(-p for p in priority), next(self._seq), time.monotonic(), torrent_hash))
+            self._queued.add(torrent_hash)
+            START_QUEUE.set(len(self._heap))
+
+    def recover(self, hashes):
+        """重启后将之前添加、仍处于暂停状态的任务重新入队；这些任务已等待较久，按添加顺序优先开始"""
+        self.client.state.sync(force=True)
+        count = 0
+        for torrent_hash in hashes:
+            fields = self.client.state.torrents.get(torrent_hash)
+            if fields is not None and fields.get('state') in PAUSED_DL_STATES and torrent_hash not in self._queued:
+                self.push(torrent_hash)
+                count += 1
+        if count:
+            logger.info(f"Recovered {count} paused torrents into the start queue")
+        return count
+
+    def _slots(self, load):
+        if load is None:
+            return 0
+        # 刚开始的任务在连接到做种者之前处于 stalledDL 或 metaDL，同样占用名额
+        slots = self.max_active - load.downloading
+        limit = self.bandwidth or load.download_limit
+        if limit:
+            if load.download_rate >= self.saturation * limit:
+                return 0
+            # 带宽已知时每轮只开始一个，等新任务的速度上来后再判断
+            slots = min(slots, 1)
+        return max(0, slots)
+
+    def pump(self):
+        """按优先级开始有余量的客户端上排队的任务，返回开始的任务数"""
+        # 整个过程持有锁，避免并发的两次调用按同一份负载各自开始任务
+        with self._lock:
+            if not self._heap:
+                return 0
+            # 刚添加的任务要在列表中出现后才能开始
+            self.client.state.sync(force=True)
+            shards = self.client.shards
+            slots = {shard: self._slots(shard.get_load()) for shard in shards}
+            now = time.monotonic()
+            kept = list()
+            to_start = list()
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                torrent_hash = entry[3]
+                shard = next((shard for shard in shards if torrent_hash in shard.state.torrents), None)
+                if shard is None:
+                    # 还没有出现在列表中的任务继续等待，长时间不出现视为已被删除
+                    if now - entry[2] < self.listing_timeout:
+                        kept.append(entry)
+                    continue
+                if shard.state.torrents[torrent_hash].get('state') not in PAUSED_DL_STATES:
+                    continue  # 已被开始、已完成或正在检查
+                if slots[shard] > 0:
+                    slots[shard] -= 1
+                    to_start.append(entry)
+                else:
+                    kept.append(entry)
+
+            if to_start and self.client.start_many([entry[3] for entry in to_start]) is None:
+                # 开始失败时留在队列中，下一轮再试
+                kept.extend(to_start)
+                to_start = list()
+            self._heap = kept
+            heapq.heapify(self._heap)
+            self._queued = {entry[3] for entry in kept}
+            START_QUEUE.set(len(self._heap))
+
+        if to_start:
+            logger.info(f"Started {len(to_start)} queued torrents, {len(self._heap)} still waiting")
+        return len(to_start)
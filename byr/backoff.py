@@ -0,0 +1,18 @@
+import random
+
+
+class Backoff:
+    """指数退避策略，带随机抖动"""
+
+    def __init__(self, base=1.0, factor=2.0, max_delay=60.0, jitter=0.2):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """第 attempt 次（从 0 开始）失败后应等待的秒数"""
+        delay = min(self.max_delay, self.base * (self.factor ** attempt))
+        if self.jitter > 0:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, delay)
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer:
+    """将短时间内到达的多个异步请求合并为一次批量调用
+
+    func 在线程中执行，接收 [item, ...] 并返回 {key: 结果}；缺少的 key 得到 None
+    """
+
+    def __init__(self, func, delay=0.2, max_size=20):
+        self.func = func
+        self.delay = delay  # 收到第一个请求后最多等待的秒数
+        self.max_size = max_size
+        self._pending = list()  # (key, item, future)
+        self._timer = None
+        self._flushes = set()  # 进行中的批量调用，事件循环只保留任务的弱引用
+
+    async def submit(self, key, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, item, future))
+        if len(self._pending) >= self.max_size:
+            self._cancel_timer()
+            task = asyncio.create_task(self._flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, list()
+        if not batch:
+            return
+        try:
+            results = await asyncio.to_thread(self.func, [item for _, item, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.debug(f"Flushed batch of {len(batch)} requests")
+        for key, _, future in batch:
+            if not future.done():
+                future.set_result(results.get(key))
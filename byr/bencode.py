@@ -0,0 +1,177 @@
+import hashlib
+from dataclasses import dataclass
+
+
+class BencodeError(ValueError):
+    """bencode 数据格式错误"""
+
+
+class _Decoder:
+    # 递归下降解析器，同时记录顶层 info 字典在原始数据中的位置，用于计算 infohash
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.info_span = None
+
+    def decode(self, depth=0):
+        data = self.data
+        if depth > 64:
+            raise BencodeError('Nesting too deep')
+        if self.pos >= len(data):
+            raise BencodeError('Unexpected end of data')
+        token = data[self.pos]
+
+        if token == 0x69:  # i<int>e
+            end = data.find(b'e', self.pos + 1)
+            if end == -1:
+                raise BencodeError('Unterminated integer')
+            try:
+                value = int(data[self.pos + 1:end])
+            except ValueError:
+                raise BencodeError(f'Invalid integer at {self.pos}') from None
+            self.pos = end + 1
+            return value
+
+        if token == 0x6c:  # l...e
+            self.pos += 1
+            items = []
+            while self._peek() != 0x65:
+                items.append(self.decode(depth + 1))
+            self.pos += 1
+            return items
+
+        if token == 0x64:  # d...e
+            self.pos += 1
+            items = {}
+            while self._peek() != 0x65:
+                key = self._decode_string()
+                value_start = self.pos
+                items[key] = self.decode(depth + 1)
+                if depth == 0 and key == b'info':
+                    self.info_span = (value_start, self.pos)
+            self.pos += 1
+            return items
+
+        if 0x30 <= token <= 0x39:
+            return self._decode_string()
+
+        raise BencodeError(f'Invalid token {chr(token)!r} at {self.pos}')
+
+    def _peek(self):
+        if self.pos >= len(self.data):
+            raise BencodeError('Unexpected end of data')
+        return self.data[self.pos]
+
+    def _decode_string(self):
+        colon = self.data.find(b':', self.pos)
+        if colon == -1:
+            raise BencodeError('Unterminated string length')
+        try:
+            length = int(self.data[self.pos:colon])
+        except ValueError:
+            raise BencodeError(f'Invalid string length at {self.pos}') from None
+        start = colon + 1
+        end = start + length
+        if length < 0 or end > len(self.data):
+            raise BencodeError('String exceeds data length')
+        self.pos = end
+        return self.data[start:end]
+
+
+def decode(data):
+    """解码 bencode 数据"""
+    decoder = _Decoder(bytes(data))
+    value = decoder.decode()
+    if decoder.pos != len(decoder.data):
+        raise BencodeError('Trailing data after bencode value')
+    return value
+
+
+def encode(value):
+    """编码为 bencode 数据"""
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b'i%de' % value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray)):
+        return b'%d:%s' % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b'l' + b''.join(encode(item) for item in value) + b'e'
+    if isinstance(value, dict):
+        items = sorted((k.encode('utf-8') if isinstance(k, str) else k, v) for k, v in value.items())
+        return b'd' + b''.join(encode(k) + encode(v) for k, v in items) + b'e'
+    raise TypeError(f'Cannot bencode {type(value).__name__}')
+
+
+@dataclass(frozen=True, slots=True)
+class TorrentMeta:
+    """从种子文件中提取的元数据"""
+    name: str
+    comment: str
+    total_size: int
+    info_hash_v1: str | None
+    info_hash_v2: str | None
+
+    @property
+    def hash(self):
+        # 与 qBittorrent 的任务 ID 一致：有 v1 时用 v1，纯 v2 种子取 v2 哈希的前 40 位
+        if self.info_hash_v1 is not None:
+            return self.info_hash_v1
+        return self.info_hash_v2[:40]
+
+
+def _file_tree_size(tree):
+    # 遍历 v2 的 file tree，叶子节点为 {'': {'length': ...}}
+    total = 0
+    for key, node in tree.items():
+        if key == b'':
+            total += node.get(b'length', 0)
+        elif isinstance(node, dict):
+            total += _file_tree_size(node)
+    return total
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return ''
+
+
+def parse_torrent(data):
+    """解析种子文件，计算 infohash（v1 / v2 / 混合）和总大小"""
+    data = bytes(data)
+    decoder = _Decoder(data)
+    torrent = decoder.decode()
+    if not isinstance(torrent, dict) or decoder.info_span is None:
+        raise BencodeError('Missing info dictionary')
+    info = torrent[b'info']
+    if not isinstance(info, dict):
+        raise BencodeError('Invalid info dictionary')
+
+    start, end = decoder.info_span
+    info_bytes = data[start:end]
+    has_v1 = b'pieces' in info
+    has_v2 = info.get(b'meta version') == 2 and b'file tree' in info
+    if not has_v1 and not has_v2:
+        raise BencodeError('Neither v1 pieces nor v2 file tree found')
+
+    if has_v1:
+        if b'files' in info:
+            # 跳过混合种子中的填充文件
+            total_size = sum(f.get(b'length', 0) for f in info[b'files']
+                             if b'p' not in f.get(b'attr', b''))
+        else:
+            total_size = info.get(b'length', 0)
+    else:
+        total_size = _file_tree_size(info[b'file tree'])
+
+    return TorrentMeta(
+        name=_text(info.get(b'name.utf-8', info.get(b'name'))),
+        comment=_text(torrent.get(b'comment.utf-8', torrent.get(b'comment'))),
+        total_size=total_size,
+        info_hash_v1=hashlib.sha1(info_bytes).hexdigest() if has_v1 else None,
+        info_hash_v2=hashlib.sha256(info_bytes).hexdigest() if has_v2 else None,
+    )
@@ -1,19 +1,39 @@
-import contextlib
+import asyncio
 import logging
+import math
 import os
-import re
 import sys
 import time
 import signal
+import threading
 from contextlib import ContextDecorator
 from urllib.parse import urljoin
-
-from bs4 import BeautifulSoup
-
-from byr.login import LoginTool
+from xml.etree.ElementTree import ParseError
+
+import requests
+
+from byr.admission import SpaceBudget, StartQueue
+from byr.backoff import Backoff
+from byr.batching import Coalescer
+from byr.eviction import EvictionPlanner
+from byr.feed import FeedScanner
+from byr.governor import BrowserGovernor
+from byr.bencode import BencodeError, parse_torrent
+from byr.history import YieldHistory
+from byr.login import LoginTool, USER_AGENT
+from byr import metrics
+from byr.models import Promo
+from byr.parser import PageCache
+from byr.ranking import TorrentRanker
+from byr.scanner import Scanner
+from byr.scheduler import ScanScheduler
+from byr.seen import SeenIndex
+from byr.session import SiteSession, SessionExpired, TransientError, TorrentFetchError
 
 logger = logging.getLogger(__name__)
 
+SPACE_MARGIN = 5 * 1024 ** 3  # 选种、准入和空间检查时始终保留的剩余空间
+
 def format_size(bytes_size):
     # 辅助函数：格式化空间大小
     gb = bytes_size / (1024 ** 3)
@@ -33,23 +53,87 @@ class Bot(ContextDecorator):
         self.page = None
         self.base_url = 'https://byr.pt/'
         self.torrent_url = self._get_url('torrents.php')
-        self.old_torrent = list()
-
-        self._tag_map = {
-            # highlight & tag
-            'free': '免费',
-            'twoup': '2x上传',
-            'twoupfree': '免费&2x上传',
-            'halfdown': '50%下载',
-            'twouphalfdown': '50%下载&2x上传',
-            'thirtypercentdown': '30%下载',
-            # icon
-            '2up': '2x上传',
-            'free2up': '免费&2x上传',
-            '50pctdown': '50%下载',
-            '50pctdown2up': '50%下载&2x上传',
-            '30pctdown': '30%下载',
-        }
+        self.seen = SeenIndex()
+
+        # 扫描模式：http 仅用浏览器登录获取 Cookie，之后通过 HTTP 会话直接请求页面；browser 保持原有的浏览器渲染方式；
+        # rss 轮询 RSS 订阅并通过带 passkey 的链接下载，只在下载被重定向到登录页时才登录
+        self.scan_mode = os.getenv('SCAN_MODE', 'http').strip().lower()
+        if self.scan_mode not in ('http', 'browser', 'rss'):
+            logger.warning(f"Unknown SCAN_MODE '{self.scan_mode}', falling back to 'http'")
+            self.scan_mode = 'http'
+        rss_url = os.getenv('RSS_URL', '').strip()
+        if self.scan_mode == 'rss' and not rss_url:
+            logger.warning("SCAN_MODE is 'rss' but RSS_URL is empty, falling back to 'http'")
+            self.scan_mode = 'http'
+        self.site = SiteSession(USER_AGENT, proxy=os.getenv("BROWSER_PROXY") or None)
+        self.page_cache = PageCache()  # browser 模式下按行复用解析结果
+        self.download_retries = 5
+        # 并发下载 .torrent 文件和调用客户端的数量上限
+        self._fetch_slots = asyncio.Semaphore(int(os.getenv('DOWNLOAD_CONCURRENCY', '4')))
+        self._client_slots = asyncio.Semaphore(int(os.getenv('CLIENT_CONCURRENCY', '2')))
+        self._admit_lock = asyncio.Lock()
+        # 新种子暂停添加后按促销类型和预期收益排队，客户端正在下载的任务数和下载速度有余量时才开始；
+        # MAX_ACTIVE_DOWNLOADS 为 0 时添加后直接开始
+        self.start_queue = StartQueue(
+            torrent_client,
+            max_active=int(os.getenv('MAX_ACTIVE_DOWNLOADS', '4')),
+            bandwidth=int(float(os.getenv('DOWNLOAD_BANDWIDTH_MB', '0')) * 1024 ** 2),
+        )
+        self._queue_recovered = False
+        self._pump = None
+        # 同一周期内的添加请求合并为一次 multipart 请求
+        self._adds = Coalescer(lambda items: torrent_client.add_many(items, paused=self.start_queue.enabled))
+        self._inflight = dict()  # 进行中的下载 seed_id -> 已预留的空间
+        # 所有分发共用的空间预算，每次分发前从客户端刷新余量
+        self.budget = SpaceBudget(0)
+        self._downloads = set()
+        self._login_lock = threading.RLock()
+        self._login_generation = 0
+        self._started_at = time.time()
+        # 保存登录 Cookie（文件权限 0600），重启后会话仍有效时无需再次登录；关闭后退出时会注销会话
+        self.persist_session = os.getenv('SESSION_PERSIST', 'true').strip().lower() in ('1', 'true', 'yes')
+        self.cookie_file = './data/session_cookies.json'
+        self.metrics_server = None
+        # 浏览器内存和标签页数超限或运行时间过长时重启浏览器
+        self.governor = BrowserGovernor(
+            login,
+            max_rss=int(os.getenv('BROWSER_MAX_RSS_MB', '600')) * 1024 ** 2,
+            max_tabs=int(os.getenv('BROWSER_MAX_TABS', '3')),
+            max_age=float(os.getenv('BROWSER_RECYCLE_HOURS', '24')) * 3600,
+        )
+        self.scheduler = ScanScheduler(
+            base_interval=int(os.getenv('SCAN_INTERVAL', '45')),
+            min_interval=int(os.getenv('SCAN_MIN_INTERVAL', '15')),
+            max_interval=int(os.getenv('SCAN_MAX_INTERVAL', '180')),
+        )
+        # 连续失败达到该次数后强制重新登录
+        self.max_scan_failures = 5
+        # 仍在开始队列中的任务不参与清理
+        self.eviction_planner = EvictionPlanner(upload_rate_threshold=200_000, promo_lookup=self.seen.promo_of,
+                                                protected=self.start_queue.__contains__)
+        # 做种任务的上传历史，为清理和选种提供窗口平均速率
+        self.history = YieldHistory(torrent_client.state)
+        # 选种：按预期上传收益排序，在可用空间内选出收益最高的组合
+        self.ranker = TorrentRanker(max_count=int(os.getenv('SELECT_MAX_TORRENTS', '10')))
+        # 单个种子的大小上限，以及选种时每轮最多计入的可清理空间
+        self.max_torrent_size = int(float(os.getenv('MAX_TORRENT_SIZE_GB', '1024')) * 1024 ** 3)
+        self.eviction_budget = int(float(os.getenv('EVICTION_BUDGET_GB', '200')) * 1024 ** 3)
+        # 清理空间时只输出删除计划，不实际删除
+        self.eviction_dry_run = os.getenv('EVICTION_DRY_RUN', 'false').strip().lower() in ('1', 'true', 'yes')
+        if self.scan_mode == 'rss':
+            # 订阅条目没有促销标签时按 RSS_PROMO 处理，订阅链接应只筛选该促销类型的种子
+            self.scanner = FeedScanner(self.site, rss_url, default_promo=Promo.from_label(os.getenv('RSS_PROMO', '免费')))
+        else:
+            # 多页、多分类并发扫描（仅 http 模式）
+            self.scanner = Scanner(
+                self.site,
+                self.base_url,
+                is_seen=lambda listing: listing.seed_id in self.seen,
+                max_pages=int(os.getenv('SCAN_PAGES', '3')),
+                categories=[c.strip() for c in os.getenv('SCAN_CATEGORIES', '').split(',') if c.strip()],
+                workers=int(os.getenv('SCAN_WORKERS', '4')),
+            )
+
         self._cat_map = {
             '电影': 'movie',
             '剧集': 'episode',
@@ -67,330 +151,561 @@ class Bot(ContextDecorator):
         logger.info("BYRBT bot started.")
         signal.signal(signal.SIGINT, _handle_interrupt)
         signal.signal(signal.SIGTERM, _handle_interrupt)
+        port = os.getenv('METRICS_PORT', '').strip()
+        if port:
+            try:
+                self.metrics_server = metrics.MetricsServer(
+                    int(port), host=os.getenv('METRICS_HOST', '127.0.0.1'), health=self.health).start()
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to start metrics server: {e}")
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.login_tool.logout()
+        if self.persist_session:
+            # 保留会话供下次启动使用，不注销
+            if self.site.has_cookies:
+                self._save_session()
+        elif self.scan_mode != 'browser' and self.login_tool.tab is None:
+            self._logout_session()
+        else:
+            self.login_tool.logout()
         self.login_tool.close()
+        self.scanner.close()
+        self.site.close()
+        self.history.close()
+        self.seen.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
         logger.info("BYRBT bot exited.")
 
+    def health(self):
+        # 最近一次成功扫描距今超过最大扫描间隔的 3 倍，视为扫描循环停滞
+        last_scan = metrics.LAST_SCAN.value()
+        reference = last_scan if last_scan is not None else self._started_at
+        age = time.time() - reference
+        limit = self.scheduler.max_interval * 3 + 60
+        return age <= limit, {
+            'last_scan_age': round(age, 1) if last_scan is not None else None,
+            'pending_downloads': len(self._inflight),
+            'scan_failures': self.scheduler.failures,
+        }
+
     def _get_url(self, url_path):
         return urljoin(self.base_url, url_path)
 
-    def _get_tag(self, tag):
+    def _login(self):
+        # 优先使用保存的 Cookie 恢复会话；失效时才用浏览器登录，并将 Cookie 交给 HTTP 会话，
+        # http、rss 模式下随后关闭浏览器以节省资源
+        with self._login_lock:
+            self._login_generation += 1
+            if self.scan_mode != 'browser' and self._restore_session():
+                return True  # http、rss 模式下 page 仅作为已登录的标记
+            metrics.LOGINS.inc()
+            page = self.login_tool.retry_login()
+            if page is None:
+                return None
+            self.site.load_cookies(self.login_tool.get_cookies())
+            if self.persist_session:
+                self._save_session()
+            if self.scan_mode != 'browser':
+                self.login_tool.close()
+                logger.debug('Browser closed, scanning through HTTP session.')
+            return page
+
+    def _restore_session(self):
+        if not self.persist_session or not self.site.load_cookie_file(self.cookie_file):
+            return False
         try:
-            if tag == '':
-                return ''
-            else:
-                tag = tag.split('_')[0]
-
-            return self._tag_map[tag]
-        except KeyError:
-            return ''
+            valid = self.site.probe(self.base_url)
+        except TransientError as e:
+            logger.warning(f"Session probe failed: {e}")
+            return False
+        if not valid:
+            logger.info('Saved session expired, login required.')
+            self.site.clear_cookies()
+            return False
+        logger.info('Session restored from saved cookies.')
+        return True
 
-    @staticmethod
-    def get_user_info(user_info_block):
+    def _save_session(self):
         try:
-            user_name = user_info_block.select_one('.nowrap').text
-            user_info_text = user_info_block.text
-            index_s = user_info_text.find('等级')
-            index_e = user_info_text.find('当前活动')
-            if index_s == -1 or index_e == -1:
-                logger.debug("User info: []")
-                return
-            user_info_text = user_info_text[index_s:index_e]
-            user_info_text = re.sub(r"[\xa0\n]+", ' ', user_info_text)
-            user_info_text = re.sub(r'\[[^]]*]', '', user_info_text)
-            user_info_text = re.sub(r'\s*[:：]\s*', ':', user_info_text)
-            user_info_text = re.sub(r'\s+', ' ', user_info_text).strip()
-            user_info_text = f"用户名:{user_name} {user_info_text}"
-            logger.debug(f"User info: {user_info_text}")
-
+            self.site.save_cookies(self.cookie_file)
+        except OSError as e:
+            logger.warning(f"Failed to save cookies: {e}")
+
+    def _relogin(self, generation):
+        # 并发下载同时发现会话失效时只重新登录一次
+        with self._login_lock:
+            if self._login_generation == generation:
+                self.page = self._login()
+            return self.page is not None
+
+    def _logout_session(self):
+        if self.login_tool.logout_url == '' or not self.site.has_cookies:
+            return
+        try:
+            self.site.get(self.login_tool.logout_url)
+            logger.info('Logout success!')
         except Exception as e:
-            logger.error(f"Failed to retrieve user info: {e}")
-
-    def get_torrent_info_filter_by_tag(self, table):
-        assert isinstance(table, list)
-        start_idx = 1  # static offset
-        torrent_infos = list()
-        for item in table:
-            torrent_info = dict()
-            tds = item.find_all('td', recursive=False)
-            # tds[0] 是 引用
-
-            # tds[1] 是分类
-            cat = tds[start_idx].find('a').text.strip()
-
-            # 主要信息的 td
-            main_td = tds[start_idx + 1]
-
-            # 链接
-            href = main_td.find('a').attrs['href'].strip()
-
-            # 种子 id
-            seed_id = re.findall(r'id=(\d+)', href)[0].strip()
-
-            # 标题
-            title = main_td.find('a').attrs['title'].strip()
-
-            tags = set(
-                [font.attrs['class'][0] for font in main_td.select('span > span') if 'class' in font.attrs.keys()])
-            if '' in tags:
-                tags.remove('')
-
-            is_seeding = len(main_td.select('img[src="/pic/seeding.png"]')) > 0
-            is_finished = len(main_td.select('img[src="/pic/finished.png"]')) > 0
-
-            is_hot = False
-            if 'hot' in tags:
-                is_hot = True
-                tags.remove('hot')
-            is_new = False
-            if 'new' in tags:
-                is_new = True
-                tags.remove('new')
-            is_recommended = False
-            if 'recommended' in tags:
-                is_recommended = True
-                tags.remove('recommended')
-
-            # 根据控制面板中促销种子的标记方式不同来匹配
-            if 'class' in item.attrs:
-                # 默认高亮方式
-                tag = self._get_tag(item.attrs['class'][0])
-            elif len(tags) == 1:
-                # 文字标记方式
-                # 不属于 hot、new、recommended 的标记即为促销标记
-                tag = self._get_tag(list(tags)[0])
-            elif len(main_td.select('img[src="/pic/trans.gif"][class^="pro_"]')) > 0:
-                # 添加图标方式
-                tag = self._get_tag(
-                    main_td.select('img[src="/pic/trans.gif"][class^="pro_"]')[-1].attrs['class'][0].split('_')[-1])
-            else:
-                tag = ''
-
-            file_size = tds[start_idx + 4].text.strip()
-
-            seeding = int(tds[start_idx + 5].text) if tds[start_idx + 5].text.isdigit() else -1
-            downloading = int(tds[start_idx + 6].text) if tds[start_idx + 6].text.isdigit() else -1
-            finished = int(tds[start_idx + 7].text) if tds[start_idx + 7].text.isdigit() else -1
-
-            torrent_info['cat'] = cat
-            torrent_info['is_hot'] = is_hot
-            torrent_info['tag'] = tag
-            torrent_info['is_seeding'] = is_seeding
-            torrent_info['is_finished'] = is_finished
-            torrent_info['seed_id'] = seed_id
-            torrent_info['title'] = title
-            torrent_info['seeding'] = seeding
-            torrent_info['downloading'] = downloading
-            torrent_info['finished'] = finished
-            torrent_info['file_size'] = file_size
-            torrent_info['is_new'] = is_new
-            torrent_info['is_recommended'] = is_recommended
-            torrent_infos.append(torrent_info)
-
-        return torrent_infos
-
-    def find_appropriate_torrents(self, torrent_infos):
-        # 获取可用的种子的策略
-        ok_infos = list()
-        if len(torrent_infos) >= 20:
-            # 遇到 free 或者免费种子太过了，择优选取，标准是(下载数/上传数)>20，并且文件大小大于 20GB
-            logger.info("Too many qualifying torrents found—possibly a Free event is active. Raising the criteria for eligible torrents.")
-            for torrent_info in torrent_infos:
-                if torrent_info['seed_id'] in self.old_torrent:
-                    continue
-                # 下载 1GB-1TB 之间的种子（下载以 GB 大小结尾的种子，脚本需要不可修改）
-                if 'GiB' not in torrent_info['file_size']:
-                    continue
-                if torrent_info['seeding'] <= 0 or torrent_info['downloading'] < 0:
-                    continue
-                if torrent_info['seeding'] != 0 and float(torrent_info['downloading']) / float(
-                        torrent_info['seeding']) < 20:
-                    continue
-                file_size = torrent_info['file_size']
-                file_size = file_size.replace('GiB', '')
-                file_size = float(file_size.strip())
-                if file_size < 20.0:
-                    continue
-                ok_infos.append(torrent_info)
+            logger.warning(f"Logout failed: {e}")
+        self.login_tool.logout_url = ''
+
+    def _scan(self):
+        # 获取并解析种子列表，返回 (用户信息, 促销种子列表)，获取页面失败时返回 None
+        if self.scan_mode != 'browser':
+            try:
+                return self.scanner.scan()
+            except SessionExpired:
+                logger.warning('Session expired, re-login required.')
+                self.page = None
+                return None
+            except requests.RequestException as e:
+                logger.error('Failed to access the website! URL: %s (%s)', self.torrent_url, repr(e))
+                return None
+            except ParseError as e:
+                logger.error(f"Invalid RSS feed: {e}")
+                return None
+
+        if self.page.get(self.torrent_url, retry=5) is False:
+            logger.error('Failed to access the website! URL: %s', self.torrent_url)
+            return None
+        self.page.scroll.to_bottom()
+        if self.page.wait.doc_loaded(timeout=10) is False:
+            logger.error('Get torrents timeout!')
+            return None
+        self.page_cache.begin()
+        return self.page_cache.parse(self.page.html)
+
+    def find_appropriate_torrents(self, listings, capacity=None):
+        # 过滤已处理和无人做种的种子，按预期上传收益在可用空间内择优选取
+        candidates = list()
+        for listing in listings:
+            if listing.seed_id in self.seen:
+                continue
+            if listing.size > self.max_torrent_size:
+                continue
+            # RSS 订阅中的种子没有做种和下载人数（均为 -1），不按人数过滤
+            if listing.download_url == '' and (listing.seeding <= 0 or listing.downloading < 0):
+                continue
+            candidates.append(listing)
+        if not candidates:
+            return []
+
+        # 历史上传收益高的分类加权，相对所有分类的平均值，限制在 0.5-2 倍之间
+        cat_yield = self._category_yield()
+        mean_yield = sum(cat_yield.values()) / len(cat_yield) if cat_yield else 0
+        if mean_yield > 0:
+            self.ranker.cat_weight = lambda cat: min(2.0, max(0.5, cat_yield.get(cat, mean_yield) / mean_yield))
         else:
-            # 正常种子选择标准是免费种子
-            for torrent_info in torrent_infos:
-                if torrent_info['seed_id'] in self.old_torrent:
-                    continue
-                if torrent_info['seeding'] <= 0 or torrent_info['downloading'] < 0:
-                    continue
-                ok_infos.append(torrent_info)
-        return ok_infos
+            self.ranker.cat_weight = None
+        return self.ranker.select(candidates, capacity)
+
+    def _category_yield(self):
+        # 各分类已添加种子的近期平均上传速率（字节/秒/GiB）
+        rates = self.history.upload_rates()
+        rate_sum = dict()
+        size_sum = dict()
+        for infohash in self.seen.added_hashes():
+            cat = self.seen.cat_of(infohash)
+            fields = self.history.state.torrents.get(infohash)
+            if not cat or fields is None or infohash not in rates:
+                continue
+            rate_sum[cat] = rate_sum.get(cat, 0) + rates[infohash]
+            size_sum[cat] = size_sum.get(cat, 0) + fields.get('size', 0) / 1024 ** 3
+        return {cat: rate_sum[cat] / max(size_sum[cat], 0.1) for cat in rate_sum}
 
     def start(self):
-        scan_interval_in_sec = 45
-        check_free_space_interval_in_sec = 3600
-        last_check_free_space_time = -1
-        while True:
-            now_time = int(time.time())
-            if now_time - last_check_free_space_time > check_free_space_interval_in_sec:
-                logger.info('Check free space ...')
-                if self.check_free_space():
-                    last_check_free_space_time = now_time
-                else:
-                    logger.error('Check free space failed!')
-                    time.sleep(scan_interval_in_sec)
-                    continue
+        asyncio.run(self._run())
 
-            if self.page is None:
-                self.page = self.login_tool.login()
-                if self.page is None:
-                    self.login_tool.clear_browser()
+    async def _run(self):
+        # 扫描作为独立任务运行，下载任务并发执行，慢速添加不会阻塞下一次扫描
+        scans = asyncio.Queue(maxsize=1)
+        scanner = asyncio.create_task(self._scan_loop(scans))
+        try:
+            while True:
+                listings = await scans.get()
+                if listings is None:
                     break
+                # 单次选种失败不影响后续扫描
+                try:
+                    await self._dispatch(listings)
+                except Exception as e:
+                    logger.error(f"Dispatch failed: {repr(e)}")
+        finally:
+            scanner.cancel()
+            if self._downloads:
+                logger.info('Waiting for %d pending downloads ...', len(self._downloads))
+                await asyncio.gather(*self._downloads, return_exceptions=True)
+
+    def run_once(self):
+        """执行一次扫描、选种、添加（及必要的清理）后返回，供定时任务使用；成功时返回 True"""
+        return asyncio.run(self._run_once())
+
+    async def _run_once(self):
+        # qBittorrent 登录与站点会话恢复同时进行
+        connect = asyncio.to_thread(self.torrent_client.connect)
+        if self.page is None and self.scan_mode != 'rss':
+            self.page, _ = await asyncio.gather(asyncio.to_thread(self._login), connect)
+            if self.page is None:
+                return False
+        else:
+            await connect
 
-            flag = False
-            torrents_soup = None
-            logger.debug('Scan torrent list ...')
-
+        listings, delay = await self._scan_cycle()
+        dispatched = True
+        if listings:
             try:
-                if self.page.get(self.torrent_url, retry=5) is False:
-                    logger.error('Failed to access the website! URL: %s', self.torrent_url)
-                else:
-                    self.page.scroll.to_bottom()
-                    if self.page.wait.doc_loaded(timeout=10) is False:
-                        logger.error('Get torrents timeout!')
-                    else:
-                        torrents_soup = BeautifulSoup(self.page.html, 'html.parser')
-                        flag = True
+                await self._dispatch(listings)
             except Exception as e:
-                logger.error('%s', repr(e))
-                self.login_tool.logout()
-                self.login_tool.clear_browser()
-                return
+                logger.error(f"Dispatch failed: {repr(e)}")
+                dispatched = False
+        if self._downloads:
+            await asyncio.gather(*self._downloads, return_exceptions=True)
+        await self._pump_starts()
+        return dispatched and delay is not None and self.scheduler.failures == 0
 
-            if not flag:
-                time.sleep(2)
-                continue
+    @staticmethod
+    def _offer(queue, item):
+        # 只保留最新一次扫描结果
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
 
-            try:
-                user_info_block = torrents_soup.select_one('#info_block').select_one('.navbar-user-data')
-                self.get_user_info(user_info_block)
-            except Exception as e:
-                logger.error('%s', repr(e))
+    def _is_new(self, listing):
+        return listing.seed_id not in self.seen and listing.seed_id not in self._inflight
+
+    def _sample_history(self):
+        try:
+            self.history.sample()
+        except Exception as e:
+            logger.warning(f"Sample upload history failed: {repr(e)}")
 
-            torrent_infos = list()
+    def _govern_browser(self):
+        # 与登录互斥；browser 模式下重启后换用新的标签页
+        with self._login_lock:
             try:
-                torrent_free_bg_table = torrents_soup.find_all('tr', class_='free_bg')
-                torrent_infos_free_bg = self.get_torrent_info_filter_by_tag(torrent_free_bg_table)
-                torrent_infos.extend(torrent_infos_free_bg)
-                torrent_twoupfree_bg_table = torrents_soup.find_all('tr', class_='twoupfree_bg')
-                torrent_infos_twoupfree_bg = self.get_torrent_info_filter_by_tag(torrent_twoupfree_bg_table)
-                torrent_infos.extend(torrent_infos_twoupfree_bg)
-                flag = True
+                restarted = self.governor.check()
             except Exception as e:
-                logger.error('%s', repr(e))
-                flag = False
-
-            if not flag:
-                logger.error('Failed to parse torrent table!')
-                break
+                logger.warning(f"Browser governor check failed: {repr(e)}")
+                return
+            if restarted and self.scan_mode == 'browser' and self.page is not None:
+                self.page = self.login_tool.tab
 
-            logger.debug('Free torrent list:')
-            for i, info in enumerate(torrent_infos):
-                logger.debug('%d : %s %s %s', i+1, info['seed_id'], info['file_size'], info['title'])
+    async def _scan_loop(self, scans):
+        try:
+            while True:
+                listings, delay = await self._scan_cycle()
+                if listings:
+                    self._offer(scans, listings)
+                if delay is None:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self._offer(scans, None)
+
+    async def _scan_cycle(self):
+        # 一次扫描周期：采样、空间检查、登录、扫描。返回 (需要选种的种子列表或 None, 下次扫描前的等待秒数)，
+        # 等待秒数为 None 表示应停止运行
+        scheduler = self.scheduler
+        await asyncio.to_thread(self._sample_history)
+        await asyncio.to_thread(self._govern_browser)
+
+        # 有任务下载完成时触发空间检查
+        if await asyncio.to_thread(self.torrent_client.pop_completed):
+            scheduler.request_space_check('completed')
+        await self._pump_starts()
+        space_checked = False
+        if scheduler.space_check_due():
+            logger.info('Check free space (%s) ...', scheduler.space_check_reasons())
+            # 清理种子与下载任务的空间预留互斥
+            async with self._admit_lock:
+                space_ok = await asyncio.to_thread(self.check_free_space)
+            if space_ok:
+                scheduler.space_checked()
+                space_checked = True
+            else:
+                logger.error('Check free space failed!')
+                return None, scheduler.on_failure()
 
-            appropriate_torrents = self.find_appropriate_torrents(torrent_infos)
-            logger.debug('Available torrent list:')
-            for i, info in enumerate(appropriate_torrents):
-                logger.debug('%d : %s %s %s', i+1, info['seed_id'], info['file_size'], info['title'])
+        # rss 模式通过 passkey 访问订阅和下载，无需预先登录
+        if self.page is None and self.scan_mode != 'rss':
+            self.page = await asyncio.to_thread(self._login)
+            if self.page is None:
+                return None, None
 
-            for torrent in appropriate_torrents:
-                if not self.download(torrent['seed_id']):
-                    logger.error('%s download failed', torrent['title'])
-                    continue
+        logger.debug('Scan torrent list ...')
+        try:
+            with metrics.SCAN_SECONDS.time():
+                scan_result = await asyncio.to_thread(self._scan)
+        except Exception as e:
+            metrics.SCANS.inc(result='error')
+            logger.error('%s', repr(e))
+            logger.error('Failed to scan torrent list!')
+            if self.scan_mode == 'browser':
+                self.login_tool.logout()
+                self.login_tool.clear_browser()
+            return None, None
+
+        if scan_result is None:
+            metrics.SCANS.inc(result='failed')
+            delay = scheduler.on_failure()
+            if scheduler.failures >= self.max_scan_failures:
+                logger.warning('Scan failed %d times in a row, re-login required.', scheduler.failures)
+                self.page = None
+            logger.debug('Retrying scan in %.1fs ...', delay)
+            return None, delay
+
+        metrics.SCANS.inc(result='ok')
+        metrics.LAST_SCAN.set(time.time())
+        user_info, promoted_listings = scan_result
+        logger.debug(f"User info: {user_info or []}")
+        # 只下载免费种子
+        listings = [listing for listing in promoted_listings if listing.promo.is_free]
+        # 只有新增或变化的行才算新种子；上一轮未选中的种子在有新种子或空间变化时一起重新选种
+        changed = self.scanner.changed if self.scan_mode != 'browser' else self.page_cache.changed
+        new_count = sum(1 for listing in listings if listing.seed_id in changed and self._is_new(listing))
+        metrics.CANDIDATES.inc(new_count, stage='found')
+
+        logger.debug('Free torrent list:')
+        for i, listing in enumerate(listings):
+            logger.debug('%d : %s %s %s', i+1, listing.seed_id, format_size(listing.size), listing.title)
+
+        scheduler.on_scan(listings, new_count)
+        if new_count > 0 or (space_checked and any(self._is_new(listing) for listing in listings)):
+            return listings, scheduler.next_delay()
+        return None, scheduler.next_delay()
+
+    async def _dispatch(self, listings):
+        # 为新种子选种并启动下载任务，不等待任务完成
+        listings = [listing for listing in listings if self._is_new(listing)]
+        if not listings:
+            return
+        # 预算按余量计算：剩余空间减去已添加（包括排队暂停）但尚未下载完的部分
+        headroom = await asyncio.to_thread(self.torrent_client.get_headroom)
+        if headroom is None:
+            logger.error('Failed to retrieve available disk space.')
+            return
+        metrics.FREE_SPACE.set(headroom)
+
+        # 仍在进行中的下载已在预算中预留空间，选种只使用其余部分
+        budget = self.budget
+        budget.refresh(headroom)
+        capacity = await asyncio.to_thread(self._selection_capacity, budget, listings)
+        appropriate_torrents = await asyncio.to_thread(self.find_appropriate_torrents, listings, capacity)
+        metrics.CANDIDATES.inc(len(appropriate_torrents), stage='selected')
+        logger.debug('Available torrent list:')
+        for i, listing in enumerate(appropriate_torrents):
+            logger.debug('%d : %s %s %s', i+1, listing.seed_id, format_size(listing.size), listing.title)
+
+        for listing in appropriate_torrents:
+            # 按列表中的大小预留，准入时换成种子文件中的实际大小
+            size = max(listing.size, 0)
+            budget.hold(size)
+            self._inflight[listing.seed_id] = size
+            task = asyncio.create_task(self._download_task(listing, budget))
+            self._downloads.add(task)
+            task.add_done_callback(self._downloads.discard)
+
+    async def _download_task(self, listing, budget):
+        try:
+            # 开始顺序：下载量计算倍率低的促销优先，其次按预期上传收益
+            priority = (-listing.promo.download_factor, self.ranker.score(listing))
+            if not await self.download(listing.seed_id, budget, promo=listing.promo.value, cat=listing.cat,
+                                       url=listing.download_url, priority=priority):
+                logger.error('%s download failed', listing.title)
+        except Exception as e:
+            logger.error(f"Download {listing.seed_id} failed: {repr(e)}")
+        finally:
+            budget.release(self._inflight.pop(listing.seed_id, 0))
+
+    def _selection_capacity(self, budget, listings=()):
+        # 可用于新种子的空间：剩余空间加上可清理的旧种子，保留 SPACE_MARGIN 余量。只计入预期上传速率低于候选种子中
+        # 最高者的旧种子（删除收益更高的旧种子换新种子不划算），且每轮最多计入 eviction_budget
+        reclaimable = 0
+        torrent_list = self.torrent_client.get_list()
+        if torrent_list:
+            planner = self.eviction_planner
+            self._load_planner_history()
+            incoming = max((planner.listing_rate(listing) for listing in listings), default=math.inf)
+            reclaimable = sum(c.size for c in planner.candidates(torrent_list) if c.expected_rate < incoming)
+        return max(0, budget.available + min(reclaimable, self.eviction_budget) - SPACE_MARGIN)
+
+    def _load_planner_history(self):
+        # 清理打分使用历史窗口内的平均上传速率和连接的下载者数，避免一次空闲的采样误判任务
+        self.eviction_planner.upload_rate = self.history.upload_rates().get
+        self.eviction_planner.average_leechers = self.history.average_leechers().get
+
+    def _start_queue_pump(self):
+        # 重启后先找回之前暂停添加、尚未开始的任务
+        if not self._queue_recovered:
+            self.start_queue.recover(self.seen.added_hashes())
+            self._queue_recovered = True
+        return self.start_queue.pump()
+
+    async def _pump_starts(self):
+        if not self.start_queue.enabled:
+            return
+        try:
+            async with self._client_slots:
+                await asyncio.to_thread(self._start_queue_pump)
+        except Exception as e:
+            logger.warning(f"Start queued torrents failed: {repr(e)}")
 
-            time.sleep(scan_interval_in_sec)
+    def _schedule_pump(self):
+        # 同一批添加完成后只尝试开始一次
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._pump_starts())
+            self._downloads.add(self._pump)
+            self._pump.add_done_callback(self._downloads.discard)
 
-    def download(self, torrent_id):
+    async def download(self, torrent_id, budget, promo='', cat='', url='', priority=(0.0,)):
         # 检查是否已处理过该种子
-        if torrent_id in self.old_torrent:
+        if torrent_id in self.seen:
             logger.info(f"Torrent {torrent_id} already processed, skipping download")
             return True
 
-        download_url = f'download.php?id={torrent_id}'
-        download_url = self._get_url(download_url)
-        torrent_content = None
+        async with self._fetch_slots:
+            torrent_content = await asyncio.to_thread(self._fetch_torrent, torrent_id, url)
+        if torrent_content is None:
+            self.seen.record(torrent_id, 'failed', promo=promo, cat=cat)
+            return False
 
-        for i in range(5):
-            try:
-                save_path = os.path.join(self.page.download_path, 'data', 'torrents')
-
-                # 抑制输出
-                with open(os.devnull, 'w') as file_null, \
-                        contextlib.redirect_stdout(file_null), \
-                        contextlib.redirect_stderr(file_null):
-
-                    result = self.page.download.download(
-                        file_url=download_url,
-                        save_path=save_path,
-                        file_exists='overwrite',
-                        rename=torrent_id,
-                        suffix='torrent'
-                    )
-
-                # 检查下载结果
-                if isinstance(result, tuple) and result[0] == 'success':
-                    torrent_path = result[1]
-                    with open(torrent_path, 'rb') as f:
-                        torrent_content = f.read()
-                    os.unlink(torrent_path)
-                    break  # 下载成功，跳出循环
-
-                # 下载失败处理
-                logger.warning(f"Download attempt {i + 1} failed, retrying ...")
-                self.page = self.login_tool.retry_login()
-                time.sleep(1)
+        # 本地解析种子大小，空间确定足够后才交给客户端
+        try:
+            meta = parse_torrent(torrent_content)
+        except BencodeError as e:
+            logger.error(f"Invalid torrent file {torrent_id}: {e}")
+            self.seen.record(torrent_id, 'invalid', promo=promo, cat=cat)
+            return False
+        if meta.total_size > self.max_torrent_size:
+            # 订阅中的种子可能没有大小，解析后再检查一次
+            logger.info(f"Torrent {torrent_id} is too large ({meta.total_size / 1024 ** 3:.1f} GiB), skipping")
+            self.seen.record(torrent_id, 'oversized', infohash=meta.hash, promo=promo, cat=cat)
+            return False
 
-            except Exception as e:
-                logger.warning(f"Failed to download torrent: {e}")
-                logger.info("Retrying login ...")
-                self.page = self.login_tool.retry_login()
-                time.sleep(1)
+        # 客户端中已有该种子（例如重启前添加的），无需占用空间预算
+        async with self._client_slots:
+            existing = await asyncio.to_thread(self.torrent_client.get_torrent, meta.hash)
+        if existing is not None:
+            logger.info(f"Torrent {torrent_id} already exists in client, skipping")
+            self.seen.record(torrent_id, 'exists', infohash=meta.hash, promo=promo, cat=cat)
+            return True
 
-        # 检查下载是否成功
-        if torrent_content is None:
-            logger.error(f"Failed to download torrent after 5 attempts: {download_url}")
+        async with self._admit_lock:
+            # 分发时按列表大小预留的空间换成实际大小
+            budget.release(self._inflight.get(torrent_id, 0))
+            self._inflight[torrent_id] = 0
+            admitted = await asyncio.to_thread(self.admit, meta.total_size, budget, meta.hash)
+        if not admitted:
+            logger.error(f'Insufficient space: Name: {meta.name}, Size: {meta.total_size / 1_000_000_000:.2f} GB')
+            self.seen.record(torrent_id, 'rejected', infohash=meta.hash, promo=promo, cat=cat)
             return False
+        self._inflight[torrent_id] = meta.total_size
 
-        # 添加种子到客户端
-        new_torrent = self.torrent_client.download_from_content(torrent_id, torrent_content, paused=True)
+        # 添加种子到客户端，排队时暂停添加
+        new_torrent = None
+        try:
+            new_torrent = await self._adds.submit(torrent_id, (torrent_id, torrent_content, meta))
+        finally:
+            if new_torrent is None:
+                # 添加失败或被取消时撤销准入时选定的客户端，否则会一直占用该客户端的余量
+                self._unassign(meta.hash)
         if new_torrent is None:
-            logger.error(f'Failed to add new torrent. Download URL: {download_url}')
+            budget.release(self._inflight.pop(torrent_id, 0))
+            logger.error(f'Failed to add new torrent: {torrent_id}')
+            self.seen.record(torrent_id, 'failed', infohash=meta.hash, promo=promo, cat=cat)
             return False
 
-        # 检查磁盘空间
-        new_torrent_size = new_torrent.total_size
-        result = self.check_remove(new_torrent_size / (1024 ** 3))
+        # 预留转为占用，下一次分发从客户端刷新余量
+        budget.commit(self._inflight.pop(torrent_id, 0))
+        logger.info(f'Added torrent: [{meta.comment}][{meta.total_size / 1_000_000_000:.3f} GB][{meta.name}]')
+        self.seen.record(torrent_id, 'added', infohash=meta.hash, promo=promo, cat=cat)  # 记录已处理的种子
+        metrics.CANDIDATES.inc(stage='admitted')
+        if self.start_queue.enabled:
+            self.start_queue.push(meta.hash, priority)
+            self._schedule_pump()
+        # 新添加的种子会占用空间，下一轮检查剩余空间
+        self.scheduler.request_space_check('pending adds')
+        return True
+
+    def admit(self, size, budget, torrent_hash=''):
+        # 在预算中为种子预留空间，不足时先清理旧种子再重试
+        if len(self.torrent_client.shards) > 1:
+            return self._admit_to_shard(size, budget, torrent_hash)
+        # 与选种时相同，预留后仍需保留 SPACE_MARGIN
+        if budget.reserve(size, margin=SPACE_MARGIN):
+            return True
 
-        if result is None or not result:  # 空间检查失败
-            self.torrent_client.remove(new_torrent.hash, delete_data=True)
-            if result is None:
-                logger.error('Space check failed unexpectedly')
-            else:
-                logger.error(f'Insufficient space: Name: {new_torrent.name}, Size: {new_torrent_size / 1_000_000_000:.2f} GB')
+        # 已添加但尚未下载完的任务之后也会写入磁盘，清理目标需包含这部分
+        load = self.torrent_client.get_load()
+        pending = load.pending if load is not None else 0
+        required_gb = (budget.reserved + size + pending + SPACE_MARGIN) / (1024 ** 3)
+        if not self.check_remove(required_gb):
             return False
-
-        # 启动种子
-        if self.torrent_client.start_torrent(new_torrent.hash):
-            logger.info(f'Added torrent: [{new_torrent.comment}][{new_torrent_size / 1_000_000_000:.3f} GB][{new_torrent.name}]')
-            self.old_torrent.append(torrent_id)  # 记录已处理的种子
-            return True
-        else:
-            logger.error(f'Failed to start torrent: {new_torrent.name}, Size: {new_torrent_size / 1_000_000_000:.2f} GB')
-            self.torrent_client.remove(new_torrent.hash, delete_data=True)
+        budget.refresh(self.torrent_client.get_headroom())
+        return budget.reserve(size, margin=SPACE_MARGIN)
+
+    def _reclaimable(self, client):
+        # client 上可清理的空间
+        torrent_list = client.get_list()
+        return sum(c.size for c in self.eviction_planner.candidates(torrent_list)) if torrent_list else 0
+
+    def _admit_to_shard(self, size, budget, torrent_hash):
+        # 多个客户端时先选定客户端，只在该客户端上按余量（与分配时相同的口径）检查和清理
+        pool = self.torrent_client
+        shard, room = pool.choose(size, reclaimable=self._reclaimable)
+        if shard is None:
             return False
+        if room < 0:
+            load = shard.get_load()
+            if load is None:
+                return False
+            required_gb = (load.free_space - room) / (1024 ** 3)
+            if not self.check_remove(required_gb, client=shard):
+                return False
+        pool.assign(torrent_hash, shard, size)
+        budget.hold(size)
+        return True
+
+    def _unassign(self, torrent_hash):
+        if len(self.torrent_client.shards) > 1:
+            self.torrent_client.unassign(torrent_hash)
+
+    def _fetch_torrent(self, torrent_id, url=''):
+        # 将种子文件直接读入内存；临时错误按退避策略重试，会话失效时仅重新登录一次
+        download_url = url or self._get_url(f'download.php?id={torrent_id}')
+        backoff = Backoff(base=1.0, max_delay=16.0)
+        relogin = False
+
+        for attempt in range(self.download_retries):
+            generation = self._login_generation
+            try:
+                with metrics.TORRENT_FETCH_SECONDS.time():
+                    return self.site.fetch_torrent(download_url)
+            except SessionExpired:
+                if relogin:
+                    logger.error(f"Session still invalid after re-login: {download_url}")
+                    return None
+                relogin = True
+                logger.info("Session expired, logging in again ...")
+                if not self._relogin(generation):
+                    return None
+            except TransientError as e:
+                delay = backoff.delay(attempt)
+                logger.warning(f"Download attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s ...")
+                time.sleep(delay)
+            except TorrentFetchError as e:
+                logger.error(f"Failed to download torrent {download_url}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Failed to download torrent {download_url}: {repr(e)}")
+                return None
+
+        logger.error(f"Failed to download torrent after {self.download_retries} attempts: {download_url}")
+        return None
 
     def check_free_space(self):
-        # 定义常量
-        min_space_required = 5_000_000_000  # 5GB
+        min_space_required = SPACE_MARGIN
 
         # 获取当前可用空间
         free_space = self.torrent_client.get_free_space()
@@ -399,28 +714,39 @@ class Bot(ContextDecorator):
             return False
 
         # 记录当前空间状态
+        metrics.FREE_SPACE.set(free_space)
         logger.info('Current free space: %s', format_size(free_space))
 
-        # 空间充足直接返回
-        if free_space > min_space_required:
-            return True
+        # 多个客户端时每个客户端分别检查和清理
+        success = True
+        for client in self.torrent_client.shards:
+            if client is not self.torrent_client:
+                free_space = client.get_free_space()
+                if free_space is None:
+                    logger.error('Failed to retrieve available disk space of %s.', client.name)
+                    success = False
+                    continue
 
-        # 开始空间不足处理流程，删除早期添加的种子
-        self.check_remove()
+            # 空间充足直接返回
+            if free_space > min_space_required:
+                continue
 
-        # 最终空间验证
-        final_space = self.torrent_client.get_free_space() or free_space
-        logger.info('Final free space: %s', format_size(final_space))
+            # 开始空间不足处理流程，删除早期添加的种子
+            self.check_remove(client=client)
 
-        return final_space > min_space_required
+            # 最终空间验证
+            final_space = client.get_free_space() or free_space
+            logger.info('Final free space: %s', format_size(final_space))
+            success = success and final_space > min_space_required
+        return success
 
-    def check_remove(self, min_free_space_gb=5):
-        # 定义常量
+    def check_remove(self, min_free_space_gb=5, client=None):
+        # 在 client 上清理种子直到剩余空间达到要求；默认为全部客户端，按收益从所有客户端的任务中选出删除集合
+        client = client or self.torrent_client
         min_space_required = min_free_space_gb * (1024 ** 3)  # 转换为字节
-        upload_rate_threshold = 200_000  # 200KB/s
 
         # 获取当前可用空间
-        free_space = self.torrent_client.get_free_space()
+        free_space = client.get_free_space()
         if free_space is None:
             logger.error("Failed to retrieve available space")
             return False
@@ -437,42 +763,37 @@ class Bot(ContextDecorator):
                        format_size(free_space), min_free_space_gb)
 
         # 获取种子列表
-        torrent_list = self.torrent_client.get_list()
+        torrent_list = client.get_list()
         if torrent_list is None:
             logger.error("Failed to retrieve torrent list")
             return False
 
-        # 排序策略：优先删除最早添加且上传速率低的种子
-        torrent_list.sort(key=lambda x: (x.added_on, x.upspeed))
+        # 按每 GB 预期上传收益选出删除集合，一次请求批量删除；上传速率和下载者数取历史窗口平均值
+        self._load_planner_history()
+        plan = self.eviction_planner.plan(torrent_list, min_space_required - free_space)
+        for torrent in plan:
+            logger.info('%s: %s (Size: %s, Expected upload: %.1f KB/s)',
+                        'Would remove' if self.eviction_dry_run else 'Removing',
+                        torrent.name, format_size(torrent.size), torrent.expected_rate / 1000)
+        planned_space = sum(torrent.size for torrent in plan)
+        if self.eviction_dry_run:
+            logger.info('Dry run: would remove %d torrents to free %s', len(plan), format_size(planned_space))
+            return False
 
-        # 遍历删除符合条件的种子
         removed_count = 0
-        for torrent in torrent_list[:]:  # 创建副本避免修改原始列表
-            if free_space >= min_space_required:
-                break
-
-            # 跳过不可删除的种子
-            if torrent.state in ['checking', 'downloading']:
-                continue
-            if torrent.state in ['uploading', 'stalledUP', 'stalledDL', 'seeding'] and \
-                    torrent.upspeed > upload_rate_threshold:
-                continue
-
-            # 执行删除操作
-            if not self.torrent_client.remove(torrent.hash, delete_data=True):
-                logger.warning("Removal failed: %s (Hash: %s)", torrent.name, torrent.hash)
-                continue
-
-            # 更新空间状态
-            free_space += torrent.total_size
-            removed_count += 1
-            logger.info('Removed: %s (Freed: %s, New free space: %s)',
-                        torrent.name,
-                        format_size(torrent.total_size),
-                        format_size(free_space))
+        if plan:
+            if client.remove([torrent.hash for torrent in plan], delete_data=True):
+                removed_count = len(plan)
+                free_space += planned_space
+                metrics.EVICTED_BYTES.inc(planned_space)
+                metrics.EVICTED_TORRENTS.inc(removed_count)
+                logger.info('Removed %d torrents (Freed: %s, New free space: %s)',
+                            removed_count, format_size(planned_space), format_size(free_space))
+            else:
+                logger.warning("Batch removal failed: %s", ', '.join(torrent.hash for torrent in plan))
 
         # 最终空间验证
-        final_space = self.torrent_client.get_free_space() or free_space
+        final_space = client.get_free_space() or free_space
         success = final_space >= min_space_required
 
         if success:
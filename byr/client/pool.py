@@ -0,0 +1,299 @@
+import logging
+import os
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+
+from byr.bencode import BencodeError, parse_torrent
+from byr.client.qbittorrent import ClientLoad, QBittorrent
+from byr.metrics import SHARD_FREE_SPACE
+
+logger = logging.getLogger(__name__)
+
+
+def create_client(connect=True):
+    """按环境变量创建客户端：只配置了 QBITTORRENT_HOST 时返回 QBittorrent，
+    另外配置了 QBITTORRENT_HOST_2、QBITTORRENT_HOST_3 …… 时返回 ClientPool"""
+    suffixes = ['']
+    while os.getenv(f'QBITTORRENT_HOST_{len(suffixes) + 1}'):
+        suffixes.append(f'_{len(suffixes) + 1}')
+    if len(suffixes) == 1:
+        return QBittorrent(connect=connect)
+    return ClientPool([QBittorrent(connect=False, suffix=suffix) for suffix in suffixes], connect=connect)
+
+
+class PoolState:
+    """合并各客户端的 MainDataState，供上传历史等只读使用"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.torrents = ChainMap(*(shard.state.torrents for shard in pool.shards))
+
+    def sync(self, force=False):
+        changed = set()
+        for shard_changed in self._pool.map(lambda shard: shard.state.sync(force=force)):
+            changed |= shard_changed
+        return changed
+
+    def pop_dirty(self):
+        dirty = set()
+        for shard in self._pool.shards:
+            dirty |= shard.state.pop_dirty()
+        return dirty
+
+    def get(self, torrent_hash):
+        for shard in self._pool.shards:
+            torrent = shard.state.get(torrent_hash)
+            if torrent is not None:
+                return torrent
+        return None
+
+
+class ClientPool:
+    """多个 qBittorrent 客户端组成的池，接口与 QBittorrent 一致
+
+    新任务分配到余量最大的客户端（剩余空间减去下载中任务未写入的部分，按正在下载的任务数和上传饱和度折算），
+    其余操作按任务所在的客户端转发，各客户端并发查询。
+    """
+
+    def __init__(self, shards, connect=True, reserve=5 * 1024 ** 3):
+        self.shards = list(shards)
+        self.reserve = reserve  # 分配时每个客户端保留的空间
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix='shard')
+        self._placed = dict()  # 已分配但尚未出现在客户端列表中的任务 hash -> 客户端
+        self._assigned = dict()  # 准入时选定客户端、尚未添加的任务 hash -> (客户端, 大小)
+        self.state = PoolState(self)
+        if connect:
+            self.connect()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def map(self, func, shards=None):
+        """在各客户端上并发执行 func，按顺序返回结果"""
+        return list(self._executor.map(func, self.shards if shards is None else shards))
+
+    def connect(self):
+        self.map(lambda shard: shard.connect())
+        logger.info(f"Connected to {len(self.shards)} qBittorrent clients.")
+
+    def owner(self, torrent_hash):
+        """任务所在的客户端，不存在时返回 None"""
+        for shard in self.shards:
+            if torrent_hash in shard.state.torrents:
+                return shard
+        return self._placed.get(torrent_hash)
+
+    def _group(self, hashes):
+        groups = dict()
+        unknown = list()
+        for torrent_hash in hashes:
+            shard = self.owner(torrent_hash)
+            if shard is None:
+                unknown.append(torrent_hash)
+            else:
+                groups.setdefault(shard, list()).append(torrent_hash)
+        return groups, unknown
+
+    def get_list(self):
+        """所有客户端的任务列表，部分客户端失败时只返回成功的部分，全部失败时返回 None"""
+        lists = self.map(lambda shard: shard.get_list())
+        if all(torrents is None for torrents in lists):
+            return None
+        return [torrent for torrents in lists if torrents is not None for torrent in torrents]
+
+    def get_free_space(self):
+        """各客户端可用空间之和，全部失败时返回 None"""
+        spaces = self.map(lambda shard: shard.get_free_space())
+        total = None
+        for shard, free_space in zip(self.shards, spaces):
+            if free_space is None:
+                logger.warning(f"Failed to get free space of {shard.name}")
+                continue
+            SHARD_FREE_SPACE.set(free_space, shard=shard.name)
+            total = (total or 0) + free_space
+        return total
+
+    def get_load(self):
+        """各客户端负载之和（上传饱和度取最大值），全部失败时返回 None"""
+        loads = [load for load in self.map(lambda shard: shard.get_load()) if load is not None]
+        if not loads:
+            return None
+        return ClientLoad(
+            free_space=sum(load.free_space for load in loads),
+            pending=sum(load.pending for load in loads),
+            downloading=sum(load.downloading for load in loads),
+            upload_saturation=max(load.upload_saturation for load in loads),
+            download_rate=sum(load.download_rate for load in loads),
+            download_limit=sum(load.download_limit for load in loads),
+        )
+
+    def get_headroom(self):
+        load = self.get_load()
+        return None if load is None else load.headroom
+
+    def _assigned_load(self):
+        # 各客户端上已选定但尚未添加的任务的总大小和个数
+        size = {shard: 0 for shard in self.shards}
+        count = {shard: 0 for shard in self.shards}
+        for shard, assigned_size in list(self._assigned.values()):
+            size[shard] += assigned_size
+            count[shard] += 1
+        return size, count
+
+    def _best(self, loads, placed_size, placed_count, size):
+        # 放入后余量最大的客户端（按正在下载的任务数和上传饱和度折算），都放不下时返回 None
+        best, best_score = None, None
+        for shard, load in loads.items():
+            if load is None:
+                continue
+            headroom = load.headroom - placed_size[shard] - size - self.reserve
+            if headroom < 0:
+                continue
+            score = headroom / (1 + load.downloading + placed_count[shard]) * (1 - 0.9 * load.upload_saturation)
+            if best_score is None or score > best_score:
+                best, best_score = shard, score
+        return best
+
+    def choose(self, size, reclaimable=None):
+        """为新种子选定客户端，返回 (客户端, 放入后的余量)；余量为负时需要先在该客户端上清理，
+        都无法获取负载时返回 (None, 0)。reclaimable 为 客户端 -> 可清理的字节数"""
+        loads = dict(zip(self.shards, self.map(lambda shard: shard.get_load())))
+        placed_size, placed_count = self._assigned_load()
+        shard = self._best(loads, placed_size, placed_count, size)
+        if shard is None:
+            # 都放不下时选清理后余量最大的客户端
+            available = [shard for shard, load in loads.items() if load is not None]
+            if not available:
+                return None, 0
+            shard = max(available, key=lambda shard: loads[shard].headroom - placed_size[shard]
+                        + (reclaimable(shard) if reclaimable is not None else 0))
+        return shard, loads[shard].headroom - placed_size[shard] - size - self.reserve
+
+    def assign(self, torrent_hash, shard, size):
+        """记录准入时选定的客户端，添加时放到该客户端上"""
+        self._assigned[torrent_hash] = (shard, size)
+
+    def unassign(self, torrent_hash):
+        """撤销准入时选定的客户端（种子未能添加时）"""
+        self._assigned.pop(torrent_hash, None)
+
+    def _place(self, items):
+        # 准入时已选定客户端的种子直接放到该客户端；其余按从大到小依次分配到放入后余量最大的客户端，
+        # 返回 {客户端: items}，放不下的种子为 None 键
+        groups = dict()
+        rest = list()
+        for item in items:
+            assignment = self._assigned.pop(item[2].hash, None)
+            if assignment is not None:
+                groups.setdefault(assignment[0], list()).append(item)
+            else:
+                rest.append(item)
+        if not rest:
+            return groups
+
+        loads = dict(zip(self.shards, self.map(lambda shard: shard.get_load())))
+        placed_size, placed_count = self._assigned_load()
+        for item in sorted(rest, key=lambda item: item[2].total_size, reverse=True):
+            size = item[2].total_size
+            best = self._best(loads, placed_size, placed_count, size)
+            if best is not None:
+                placed_size[best] += size
+                placed_count[best] += 1
+            groups.setdefault(best, list()).append(item)
+        return groups
+
+    def download_from_content(self, torrent_id, content, paused=False, meta=None):
+        return self.add_many([(torrent_id, content, meta)], paused=paused).get(torrent_id)
+
+    def add_many(self, items, paused=False):
+        """将种子分配到各客户端后并发添加，返回 {torrent_id: 结果}"""
+        results = dict()
+        parsed = list()
+        for torrent_id, content, meta in items:
+            if meta is None:
+                try:
+                    # 分配时需要知道种子大小
+                    meta = parse_torrent(content)
+                except BencodeError as e:
+                    logger.error(f"Invalid torrent file {torrent_id}: {e}")
+                    results[torrent_id] = None
+                    continue
+            parsed.append((torrent_id, content, meta))
+
+        groups = self._place(parsed)
+        for torrent_id, _, meta in groups.pop(None, []):
+            logger.error(f"No client has room for torrent {torrent_id} ({meta.total_size / 1024 ** 3:.2f} GiB)")
+            results[torrent_id] = None
+        shards = list(groups)
+        responses = self.map(lambda shard: shard.add_many(groups[shard], paused=paused), shards)
+        for shard, shard_results in zip(shards, responses):
+            for torrent_id, _, meta in groups[shard]:
+                if shard_results.get(torrent_id) is None:
+                    continue
+                logger.debug(f"Placed torrent {torrent_id} on {shard.name}")
+                if meta.hash not in shard.state.torrents:
+                    self._placed[meta.hash] = shard
+            results.update(shard_results)
+        return results
+
+    def remove(self, hashes, delete_data=False):
+        if isinstance(hashes, str):
+            hashes = [hashes]
+        return self.remove_many(hashes, delete_data=delete_data) is not None
+
+    def remove_many(self, hashes, delete_data=False):
+        """按任务所在的客户端分别删除，返回 {hash: 是否已删除}，全部请求失败时返回 None"""
+        self.state.sync()
+        groups, unknown = self._group(hashes)
+        results = dict.fromkeys(unknown, False)
+        shards = list(groups)
+        responses = self.map(lambda shard: shard.remove_many(groups[shard], delete_data=delete_data), shards)
+        if shards and all(response is None for response in responses):
+            return None
+        for shard, response in zip(shards, responses):
+            results.update(response or dict.fromkeys(groups[shard], False))
+        for torrent_hash, removed in results.items():
+            if removed:
+                self._placed.pop(torrent_hash, None)
+        return results
+
+    def get_torrent(self, torrent_hash):
+        for torrent in self.map(lambda shard: shard.get_torrent(torrent_hash)):
+            if torrent is not None:
+                return torrent
+        return None
+
+    def pop_completed(self):
+        completed = set()
+        for shard_completed in self.map(lambda shard: shard.pop_completed()):
+            completed |= shard_completed
+        # 已出现在客户端列表中的任务不再需要单独记录所在的客户端
+        self._placed = {h: shard for h, shard in self._placed.items() if h not in shard.state.torrents}
+        return completed
+
+    def start_torrent(self, hashes):
+        if isinstance(hashes, str):
+            hashes = [hashes]
+        return self.start_many(hashes) is not None
+
+    def start_many(self, hashes):
+        groups, unknown = self._group(hashes)
+        results = dict.fromkeys(unknown, False)
+        shards = list(groups)
+        responses = self.map(lambda shard: shard.start_many(groups[shard]), shards)
+        if shards and all(response is None for response in responses):
+            return None
+        for shard, response in zip(shards, responses):
+            results.update(response or dict.fromkeys(groups[shard], False))
+        return results
+
+    def properties_many(self, hashes):
+        groups, _ = self._group(hashes)
+        shards = list(groups)
+        responses = self.map(lambda shard: shard.properties_many(groups[shard]), shards)
+        if shards and all(response is None for response in responses):
+            return None
+        results = dict()
+        for response in responses:
+            results.update(response or {})
+        return results
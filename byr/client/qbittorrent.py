@@ -1,37 +1,79 @@
 import logging
 import os
-import time
-import uuid
+from dataclasses import dataclass
 
 from qbittorrentapi import Client, LoginFailed
 
+from byr.bencode import BencodeError, parse_torrent
+from byr.client.state import MainDataState
+from byr.metrics import observe_client_response
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 这些状态的任务计为正在下载
+DOWNLOADING_STATES = frozenset({
+    'downloading', 'forcedDL', 'metaDL', 'forcedMetaDL', 'stalledDL', 'queuedDL', 'checkingDL', 'allocating',
+})
+# 暂停（未开始）的下载任务；qBittorrent 5.0 起称为 stopped
+PAUSED_DL_STATES = frozenset({'pausedDL', 'stoppedDL'})
+
+
+@dataclass(slots=True)
+class ClientLoad:
+    """客户端当前负载，用于在多个客户端之间分配新任务"""
+    free_space: int  # 与 get_free_space 相同
+    pending: int  # 下载中的任务尚未写入磁盘的字节数
+    downloading: int  # 已开始的下载任务数（含正在连接、获取元数据和无人做种的停滞任务）
+    upload_saturation: float  # 上传速度占上传限速的比例，未限速时为 0
+    download_rate: int = 0  # 全局下载速度（字节/秒）
+    download_limit: int = 0  # 全局下载限速（字节/秒），0 表示不限速
+
+    @property
+    def headroom(self):
+        return self.free_space - self.pending
+
 
 class QBittorrent:
-    def __init__(self):
-        self.max_torrent_total_size = int(os.getenv("MAX_TORRENTS_SIZE"))
+    def __init__(self, connect=True, suffix=''):
+        # suffix 用于多客户端配置（如 QBITTORRENT_HOST_2），未单独配置的项沿用不带后缀的值
+        self.suffix = suffix
+        self.max_torrent_total_size = int(self._env("MAX_TORRENTS_SIZE"))
         if self.max_torrent_total_size is None or self.max_torrent_total_size <= 0:
             self.max_torrent_total_size = -1
         self.max_torrent_total_size = self.max_torrent_total_size * 1024 * 1024 * 1024
 
-        self.host = os.getenv('QBITTORRENT_HOST')
-        self.username = os.getenv('QBITTORRENT_USERNAME')
-        self.password = os.getenv('QBITTORRENT_PASSWORD')
-        self.download_path = os.getenv('QBITTORRENT_DOWNLOAD_PATH')
-        self.client = None
-        self._connect()
+        self.host = os.getenv(f'QBITTORRENT_HOST{suffix}')
+        self.username = self._env('QBITTORRENT_USERNAME')
+        self.password = self._env('QBITTORRENT_PASSWORD')
+        self.download_path = self._env('QBITTORRENT_DOWNLOAD_PATH')
+        self.name = self.host
+        self.pool_size = int(os.getenv('CLIENT_CONCURRENCY', '2'))
+        # 创建客户端不发起请求；connect=False 时推迟到 connect() 或第一次请求时再登录
+        self.client = Client(
+            host=f"{self.host}",
+            username=self.username,
+            password=self.password,
+            VERIFY_WEBUI_CERTIFICATE=False,  # 忽略证书验证
+            # 复用同一个已认证的会话，连接池与并发调用数匹配
+            HTTPADAPTER_ARGS={'pool_connections': 1, 'pool_maxsize': self.pool_size},
+            REQUESTS_ARGS={'hooks': {'response': observe_client_response}},  # 记录各接口耗时
+        )
+        self.state = MainDataState(self.client)
+        if connect:
+            self.connect()
+
+    def _env(self, name):
+        return os.getenv(f'{name}{self.suffix}') or os.getenv(name)
 
-    def _connect(self):
-        """连接到 qBittorrent 客户端"""
+    @property
+    def shards(self):
+        """按客户端分别检查空间和清理时使用的客户端列表"""
+        return [self]
+
+    def connect(self):
+        """登录 qBittorrent 客户端"""
         try:
-            self.client = Client(
-                host=f"{self.host}",
-                username=self.username,
-                password=self.password,
-                VERIFY_WEBUI_CERTIFICATE=False  # 忽略证书验证
-            )
             self.client.auth_log_in()  # 显式登录
             logger.info("Successfully connected to qBittorrent.")
         except LoginFailed as e:
@@ -44,7 +86,8 @@ class QBittorrent:
     def get_list(self):
         """获取所有任务列表"""
         try:
-            return self.client.torrents_info()
+            self.state.sync()
+            return self.state.torrent_list()
         except Exception as e:
             logger.error(f"Get torrent list failed: {e}")
             return None
@@ -52,9 +95,9 @@ class QBittorrent:
     def get_free_space(self):
         """获取下载目录可用剩余空间"""
         try:
-            free_disk_space = self.client.sync.maindata().server_state.free_space_on_disk
-            completed_torrents = self.client.torrents_info(status_filter='completed')
-            total_selected_bytes = sum(t.size for t in completed_torrents)
+            self.state.sync()
+            free_disk_space = self.state.free_space_on_disk
+            total_selected_bytes = self.state.completed_bytes
             if self.max_torrent_total_size == -1:
                 logger.warning("MAX_TORRENTS_SIZE is invalid")
                 return free_disk_space
@@ -64,89 +107,167 @@ class QBittorrent:
             logger.error(f"Get free space failed: {e}")
             return None
 
+    def get_load(self):
+        """获取分配新任务所需的负载信息，失败时返回 None"""
+        free_space = self.get_free_space()
+        if free_space is None:
+            return None
+        pending = 0
+        downloading = 0
+        for fields in list(self.state.torrents.values()):
+            if fields.get('progress', 1.0) < 1.0:
+                pending += max(0, fields.get('amount_left', fields.get('size', 0) - fields.get('downloaded', 0)))
+            if fields.get('state') in DOWNLOADING_STATES:
+                downloading += 1
+        server_state = self.state.server_state
+        up_limit = server_state.get('up_rate_limit', 0)
+        saturation = server_state.get('up_info_speed', 0) / up_limit if up_limit > 0 else 0.0
+        return ClientLoad(free_space, pending, downloading, min(1.0, saturation),
+                          download_rate=server_state.get('dl_info_speed', 0),
+                          download_limit=server_state.get('dl_rate_limit', 0))
+
+    def get_headroom(self):
+        """可用于新任务的空间：剩余空间减去下载中任务尚未写入的部分，失败时返回 None"""
+        load = self.get_load()
+        return None if load is None else load.headroom
+
     def remove(self, hashes, delete_data=False):
         """删除任务"""
+        if isinstance(hashes, str):
+            hashes = [hashes]
+        result = self.remove_many(hashes, delete_data=delete_data)
+        return result is not None
+
+    def remove_many(self, hashes, delete_data=False):
+        """一次请求删除多个任务，返回 {hash: 是否已删除}（客户端中本不存在的任务为 False），请求失败时返回 None"""
         try:
-            if isinstance(hashes, str):
-                hashes = [hashes]
+            hashes = list(hashes)
+            if not hashes:
+                return dict()
+            self.state.sync()
+            known = {h for h in hashes if h in self.state.torrents}
             self.client.torrents_delete(
                 delete_files=delete_data,
                 torrent_hashes=hashes
             )
-            return True
+            self.state.sync(force=True)
+            return {h: h in known and h not in self.state.torrents for h in hashes}
         except Exception as e:
             logger.error(f"Remove torrent failed: {e}")
-            return False
+            return None
 
-    def download_from_content(self, torrent_id, content, paused=False):
+    def download_from_content(self, torrent_id, content, paused=False, meta=None):
         """通过种子内容添加任务"""
+        return self.add_many([(torrent_id, content, meta)], paused=paused).get(torrent_id)
+
+    def add_many(self, items, paused=False):
+        """在一个 multipart 请求中添加多个种子
+
+        items 为 (torrent_id, content, meta) 列表，meta 可为 None。返回 {torrent_id: 结果}：
+        客户端中的任务、尚未出现在列表中时的本地元数据，或失败时的 None
+        """
+        results = dict()
+        files = dict()
+        metas = dict()
+        for torrent_id, content, meta in items:
+            if meta is None:
+                try:
+                    # 本地解析种子，预先得到 infohash，无需轮询任务列表
+                    meta = parse_torrent(content)
+                except BencodeError as e:
+                    logger.error(f"Invalid torrent file {torrent_id}: {e}")
+                    results[torrent_id] = None
+                    continue
+            files[f'{torrent_id}.torrent'] = content
+            metas[torrent_id] = meta
+        if not files:
+            return results
+
         try:
-            # 获取当前最新任务的时间戳作为基准点
-            existing_torrents = self.client.torrents.info(sort='added_on', reverse=True)
-            last_added_time = existing_torrents[0].added_on if existing_torrents else 0
-
-            # 添加任务
-            unique_tag = f"temp_{uuid.uuid4().hex}"
-            self.client.torrents_add(
-                torrent_files=content,
+            response = self.client.torrents_add(
+                torrent_files=files,
                 save_path=self.download_path,
                 is_paused=paused,
-                tags=[unique_tag]  # 添加唯一标签
             )
+            added = self._added_hashes(response)
 
-            # 重试机制确保获取新任务
-            new_torrent = None
-            retries = 5  # 最多重试 5 次
-            while retries > 0 and not new_torrent:
-                time.sleep(0.5)  # 每次等待 0.5 秒
-                retries -= 1
-
-                # 方法 1：通过时间戳过滤
-                latest_torrents = self.client.torrents.info(sort='added_on', reverse=True)
-                for latest_torrent in latest_torrents:
-                    if latest_torrent.added_on > last_added_time or latest_torrent.comment == torrent_id:
-                        new_torrent = latest_torrent
-                        break
-
-                # 方法 2：通过唯一标签过滤
-                if not new_torrent:
-                    tagged = self.client.torrents_info(tag=unique_tag)
-                    if tagged:
-                        new_torrent = tagged[0]
-
-            # 移除种子上的临时标签
-            if new_torrent and unique_tag in new_torrent.tags:
-                try:
-                    self.client.torrents_remove_tags(
-                        torrent_hashes=new_torrent.hash,
-                        tags=[unique_tag]
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to remove temp tag: {e}")
-
-            # 删除创建的临时标签
-            try:
-                all_tags = self.client.torrents_tags()
-                temp_tags = [tag for tag in all_tags if tag.startswith('temp_')]
-                if temp_tags:
-                    self.client.torrents_delete_tags(tags=temp_tags)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp tags: {e}")
-
-            return new_torrent
+            # 一次增量同步即可拿到所有新任务
+            self.state.sync(force=True)
+            for torrent_id, meta in metas.items():
+                new_torrent = self.state.get(meta.hash)
+                if new_torrent is not None:
+                    results[torrent_id] = new_torrent
+                elif added is None or meta.hash in added:
+                    # 任务仍在客户端内部排队，直接返回本地解析出的元数据
+                    logger.debug(f"Torrent {meta.hash} not listed yet, using local metadata")
+                    results[torrent_id] = meta
+                else:
+                    logger.warning(f"qBittorrent rejected torrent {torrent_id} ({meta.hash}), it may already exist")
+                    results[torrent_id] = None
+            logger.debug(f"Added {sum(r is not None for r in results.values())}/{len(items)} torrents in one request")
+            return results
 
         except Exception as e:
             logger.error(f"Add torrent failed: {e}")
+            return {torrent_id: None for torrent_id, _, _ in items}
+
+    @staticmethod
+    def _added_hashes(response):
+        # 返回客户端确认添加成功的哈希集合；旧版本只返回 'Ok.'/'Fails.'，无法区分时返回 None
+        if isinstance(response, str):
+            return None if response == 'Ok.' else set()
+        added = response.get('added_torrent_ids')
+        if added is None:
+            return None if response.get('success_count', 0) else set()
+        return set(added)
+
+    def get_torrent(self, torrent_hash):
+        """按哈希获取任务"""
+        try:
+            self.state.sync()
+            return self.state.get(torrent_hash)
+        except Exception as e:
+            logger.error(f"Get torrent failed: {e}")
             return None
 
+    def pop_completed(self):
+        """获取自上次调用以来新完成的任务哈希"""
+        try:
+            self.state.sync()
+            return self.state.pop_completed()
+        except Exception as e:
+            logger.error(f"Get completed torrents failed: {e}")
+            return set()
+
     def start_torrent(self, hashes):
         """开始任务"""
+        if isinstance(hashes, str):
+            hashes = [hashes]
+        return self.start_many(hashes) is not None
+
+    def start_many(self, hashes):
+        """一次请求开始多个任务，返回 {hash: 任务是否存在于客户端}，请求失败时返回 None"""
         try:
+            hashes = list(hashes)
+            if not hashes:
+                return dict()
             self.client.torrents_resume(torrent_hashes=hashes)
-            return True
+            self.state.invalidate()
+            return {h: h in self.state.torrents for h in hashes}
         except Exception as e:
             logger.error(f"Start torrent failed: {e}")
-            return False
+            return None
+
+    def properties_many(self, hashes):
+        """一次请求获取多个任务的详细信息，返回 {hash: 任务}，不存在的任务不在结果中"""
+        try:
+            hashes = list(hashes)
+            if not hashes:
+                return dict()
+            return {torrent.hash: torrent for torrent in self.client.torrents_info(torrent_hashes=hashes)}
+        except Exception as e:
+            logger.error(f"Get torrent properties failed: {e}")
+            return None
 
 if __name__ == '__main__':
     from dotenv import load_dotenv
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+
+from qbittorrentapi import TorrentDictionary
+
+logger = logging.getLogger(__name__)
+
+
+class MainDataState:
+    """基于 sync/maindata 增量接口（rid）的客户端状态缓存"""
+
+    def __init__(self, client, min_interval=1.0):
+        self._client = client
+        self.min_interval = min_interval
+        self.rid = 0
+        self.torrents = dict()  # hash -> 原始字段
+        self.server_state = dict()
+        self.completed = set()  # 已完成任务的哈希
+        self._newly_completed = set()
+        self._dirty = set()  # 自上次采样以来发生变化的任务
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """标记缓存过期，下一次查询时立即同步"""
+        self._last_sync = None
+
+    def sync(self, force=False):
+        """拉取自上次 rid 以来的增量数据，返回发生变化的任务哈希集合"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_sync is not None and now - self._last_sync < self.min_interval:
+                return set()
+
+            initial = self.rid == 0
+            data = self._client.sync_maindata(rid=self.rid)
+            if data.get('full_update'):
+                self.torrents.clear()
+                self.server_state.clear()
+
+            changed = set()
+            for torrent_hash, fields in (data.get('torrents') or {}).items():
+                self.torrents.setdefault(torrent_hash, dict()).update(fields)
+                changed.add(torrent_hash)
+            for torrent_hash in data.get('torrents_removed') or []:
+                self.torrents.pop(torrent_hash, None)
+                changed.add(torrent_hash)
+            self.server_state.update(data.get('server_state') or {})
+            if data.get('full_update'):
+                self.completed.intersection_update(self.torrents)
+            self._track_completion(changed, initial)
+            self._dirty.update(changed)
+
+            self.rid = data.get('rid', self.rid)
+            self._last_sync = now
+            logger.debug(f"Synced maindata rid={self.rid}, {len(changed)} torrents changed")
+            return changed
+
+    def _track_completion(self, changed, initial):
+        # 记录进度变为 100% 的任务；首次全量同步时已完成的任务不算新完成
+        for torrent_hash in changed:
+            fields = self.torrents.get(torrent_hash)
+            done = fields is not None and fields.get('progress', 0) >= 1
+            if done and torrent_hash not in self.completed:
+                self.completed.add(torrent_hash)
+                if not initial:
+                    self._newly_completed.add(torrent_hash)
+            elif not done:
+                self.completed.discard(torrent_hash)
+                self._newly_completed.discard(torrent_hash)
+
+    def pop_completed(self):
+        """返回并清空自上次调用以来新完成的任务哈希"""
+        with self._lock:
+            completed, self._newly_completed = self._newly_completed, set()
+            return completed
+
+    def pop_dirty(self):
+        """返回并清空自上次调用以来发生变化的任务哈希"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    @property
+    def free_space_on_disk(self):
+        return self.server_state.get('free_space_on_disk')
+
+    @property
+    def completed_bytes(self):
+        """已完成任务的选中文件总大小"""
+        # sync 在其他线程中同时修改 completed 和 torrents
+        with self._lock:
+            return sum(self.torrents[h].get('size', 0) for h in self.completed if h in self.torrents)
+
+    def _to_torrent(self, torrent_hash, fields):
+        return TorrentDictionary(data=dict(fields, hash=torrent_hash), client=self._client)
+
+    def get(self, torrent_hash):
+        fields = self.torrents.get(torrent_hash)
+        if fields is None:
+            return None
+        return self._to_torrent(torrent_hash, fields)
+
+    def torrent_list(self):
+        return [self._to_torrent(h, fields) for h, fields in list(self.torrents.items())]
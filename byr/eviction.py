@@ -0,0 +1,131 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from byr.models import Promo
+
+logger = logging.getLogger(__name__)
+
+# 这些状态的任务不参与清理；暂停、排队和停滞的下载任务多半刚由开始队列添加，尚未开始或正在连接
+PROTECTED_STATES = frozenset({
+    'checking', 'downloading', 'forcedDL', 'metaDL', 'forcedMetaDL',
+    'checkingDL', 'checkingUP', 'checkingResumeData', 'allocating', 'moving',
+    'pausedDL', 'stoppedDL', 'queuedDL', 'stalledDL',
+})
+_SEEDING_STATES = frozenset({'uploading', 'stalledUP', 'seeding', 'forcedUP'})
+
+
+@dataclass(slots=True)
+class EvictionCandidate:
+    hash: str
+    name: str
+    size: int  # 删除后腾出的空间，即已下载的字节数
+    expected_rate: float  # 预计上传速率（字节/秒）
+
+    @property
+    def yield_per_gb(self):
+        return self.expected_rate / max(self.size / 1024 ** 3, 0.1)
+
+
+class EvictionPlanner:
+    """按每 GB 预期上传收益为做种任务打分，选出能腾出目标空间、损失收益最小的删除集合"""
+
+    def __init__(self, upload_rate_threshold=200_000, demand_weight=10 * 1024, age_half_life_days=30,
+                 promo_lookup=None, upload_rate=None, protected=None, average_leechers=None):
+        self.upload_rate_threshold = upload_rate_threshold
+        self.demand_weight = demand_weight  # 每单位下载/做种比折算的上传速率（字节/秒）
+        self.age_half_life_days = age_half_life_days
+        self.promo_lookup = promo_lookup  # infohash -> 促销标签
+        self.upload_rate = upload_rate  # infohash -> 近期平均上传速率，缺省使用瞬时速率
+        self.protected = protected  # infohash -> 是否不参与清理（例如仍在开始队列中的任务）
+        self.average_leechers = average_leechers  # infohash -> 近期连接的平均下载者数，缺省使用当前值
+
+    def expected_rate(self, torrent, now):
+        rate = None
+        if self.upload_rate is not None:
+            rate = self.upload_rate(torrent.hash)
+        if rate is None:
+            rate = torrent.get('upspeed', 0)
+
+        # 需求：种群中下载者相对做种者越多，未来上传潜力越大
+        connected = None
+        if self.average_leechers is not None:
+            connected = self.average_leechers(torrent.hash)
+        if connected is None:
+            connected = torrent.get('num_leechs', 0)
+        leechers = max(torrent.get('num_incomplete', 0), connected)
+        seeders = max(torrent.get('num_complete', 0), torrent.get('num_seeds', 0))
+        demand = leechers / (seeders + 1)
+
+        promo = Promo.NONE
+        if self.promo_lookup is not None:
+            promo = Promo.from_label(self.promo_lookup(torrent.hash))
+
+        age_days = max(0.0, (now - torrent.get('added_on', now)) / 86400)
+        age_factor = 0.5 ** (age_days / self.age_half_life_days)
+        return (rate + self.demand_weight * demand * age_factor) * promo.upload_factor
+
+    def listing_rate(self, listing):
+        """新种子的预计上传速率（字节/秒），与 expected_rate 中的需求项同一尺度；人数未知时返回 inf"""
+        if listing.seeding < 0 or listing.downloading < 0:
+            return math.inf
+        demand = listing.downloading / (listing.seeding + 1)
+        return self.demand_weight * demand * listing.promo.upload_factor
+
+    def candidates(self, torrents, now=None):
+        now = time.time() if now is None else now
+        result = list()
+        for torrent in torrents:
+            state = torrent.get('state', '')
+            if state in PROTECTED_STATES:
+                continue
+            if self.protected is not None and self.protected(torrent.hash):
+                continue
+            # 正在高速上传的任务不删除
+            if state in _SEEDING_STATES and torrent.get('upspeed', 0) > self.upload_rate_threshold:
+                continue
+            # 未完成的任务删除后只腾出已下载的部分
+            total_size = torrent.get('total_size', torrent.get('size', 0))
+            size = total_size - max(0, torrent.get('amount_left', total_size - torrent.get('downloaded', total_size)))
+            if size <= 0:
+                continue
+            result.append(EvictionCandidate(
+                hash=torrent.hash,
+                name=torrent.get('name', ''),
+                size=size,
+                expected_rate=self.expected_rate(torrent, now),
+            ))
+        return result
+
+    def plan(self, torrents, bytes_needed, now=None):
+        """返回需要删除的任务列表；可删除的空间不足时返回全部候选"""
+        if bytes_needed <= 0:
+            return []
+        candidates = self.candidates(torrents, now)
+        if sum(c.size for c in candidates) < bytes_needed:
+            logger.warning('Evictable torrents cannot free enough space, evicting all candidates')
+            return sorted(candidates, key=lambda c: c.yield_per_gb)
+
+        # 贪心：优先删除每 GB 收益最低的任务
+        greedy = list()
+        freed = 0
+        for candidate in sorted(candidates, key=lambda c: c.yield_per_gb):
+            if freed >= bytes_needed:
+                break
+            greedy.append(candidate)
+            freed += candidate.size
+
+        # 去掉多余的任务：从收益最高的开始，删除后仍满足目标就保留它
+        for candidate in sorted(greedy, key=lambda c: c.expected_rate, reverse=True):
+            if freed - candidate.size >= bytes_needed:
+                greedy.remove(candidate)
+                freed -= candidate.size
+
+        # 如果单个大任务就能满足目标且损失的收益不高于贪心方案，优先选择单个任务
+        greedy_loss = sum(c.expected_rate for c in greedy)
+        single = min((c for c in candidates if c.size >= bytes_needed),
+                     key=lambda c: (c.expected_rate, c.size), default=None)
+        if single is not None and len(greedy) > 1 and single.expected_rate <= greedy_loss:
+            return [single]
+        return greedy
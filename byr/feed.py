@@ -0,0 +1,138 @@
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+
+from byr.metrics import PARSE_SECONDS
+from byr.models import Promo, TorrentListing, parse_size
+
+logger = logging.getLogger(__name__)
+
+_ID_RE = re.compile(r'[?&]id=(\d+)')
+_LABEL_RE = re.compile(r'\[([^]]*)]')
+
+
+def _promo_of(title, default):
+    # 标题中带有促销标签时以标签为准，否则使用订阅筛选条件对应的促销类型
+    for label in _LABEL_RE.findall(title):
+        promo = Promo.from_label(label.strip())
+        if promo is not Promo.NONE:
+            return promo
+    return default
+
+
+def parse_item(item, default_promo=Promo.FREE):
+    """解析 RSS 中的一个 <item>，不是促销种子或无法识别时返回 None"""
+    link = item.findtext('link') or ''
+    enclosure = item.find('enclosure')
+    download_url = (enclosure.get('url') or '').strip() if enclosure is not None else ''
+    match = _ID_RE.search(link) or _ID_RE.search(download_url) or _ID_RE.search(item.findtext('guid') or '')
+    if match is None:
+        return None
+
+    title = (item.findtext('title') or '').strip()
+    promo = _promo_of(title, default_promo)
+    if promo is Promo.NONE:
+        return None
+
+    size = -1
+    length = enclosure.get('length', '') if enclosure is not None else ''
+    if length.isdigit() and int(length) > 0:
+        size = int(length)
+    else:
+        # 开启“显示大小”时标题末尾带有 [12.34 GB]
+        size = parse_size(title)
+    return TorrentListing(
+        seed_id=match.group(1),
+        title=title,
+        cat=(item.findtext('category') or '').strip(),
+        promo=promo,
+        size=size,
+        # 订阅中没有做种和下载人数
+        seeding=-1,
+        downloading=-1,
+        finished=-1,
+        download_url=download_url,
+    )
+
+
+class FeedParser:
+    """增量解析 RSS：边接收边产出种子，处理过的 <item> 立即释放"""
+
+    def __init__(self, default_promo=Promo.FREE):
+        self.default_promo = default_promo
+        self._parser = ET.XMLPullParser(events=('end',))
+
+    def feed(self, data):
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self):
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self):
+        listings = list()
+        for _, element in self._parser.read_events():
+            if element.tag != 'item':
+                continue
+            listing = parse_item(element, self.default_promo)
+            element.clear()
+            if listing is not None:
+                listings.append(listing)
+        return listings
+
+
+class FeedScanner:
+    """以条件请求（ETag/If-Modified-Since）轮询 NexusPHP 的 RSS 订阅（torrentrss.php），接口与 Scanner 一致"""
+
+    def __init__(self, site, url, default_promo=Promo.FREE, chunk_size=16 * 1024):
+        self.site = site
+        self.url = url  # 站点“RSS 订阅”页面生成的链接，包含 passkey 和筛选条件
+        self.default_promo = default_promo
+        self.chunk_size = chunk_size
+        self.etag = None
+        self.last_modified = None
+        self._listings = list()  # 上一次的结果，订阅未变化时复用
+        self.changed = set()  # 上一次扫描中新增或促销变化的种子 ID
+
+    def close(self):
+        pass
+
+    def scan(self):
+        """返回 (None, 促销种子列表)；订阅中没有用户信息。返回的不是合法 XML 时抛出 ET.ParseError"""
+        headers = dict()
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        response = self.site.get(self.url, headers=headers, stream=True)
+        with response:
+            if response.status_code == 304:
+                logger.debug('Feed not modified')
+                self.changed = set()
+                return None, list(self._listings)
+
+            parser = FeedParser(self.default_promo)
+            listings = dict()
+            parse_seconds = 0.0
+            size = 0
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                size += len(chunk)
+                started = time.perf_counter()
+                for listing in parser.feed(chunk):
+                    listings.setdefault(listing.seed_id, listing)
+                parse_seconds += time.perf_counter() - started
+            for listing in parser.close():
+                listings.setdefault(listing.seed_id, listing)
+            PARSE_SECONDS.observe(parse_seconds)
+
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+
+        previous = {(listing.seed_id, listing.promo) for listing in self._listings}
+        self.changed = {seed_id for seed_id, listing in listings.items() if (seed_id, listing.promo) not in previous}
+        self._listings = list(listings.values())
+        logger.debug(f"Feed: {size} bytes, {len(self._listings)} promoted torrents")
+        return None, list(self._listings)
@@ -0,0 +1,79 @@
+import logging
+import time
+
+import psutil
+
+from byr import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserGovernor:
+    """监控浏览器进程树的内存和标签页数量，超限或运行时间过长时重启浏览器（保留 Cookie）"""
+
+    def __init__(self, login_tool, max_rss=600 * 1024 ** 2, max_tabs=3, max_age=24 * 3600):
+        self.login_tool = login_tool
+        self.max_rss = max_rss  # 进程树常驻内存上限（字节），0 表示不限制
+        self.max_tabs = max_tabs
+        self.max_age = max_age  # 浏览器最长运行时间（秒），0 表示不限制
+
+    def usage(self):
+        """返回 (进程树常驻内存字节数, 标签页数)，浏览器未运行时返回 None"""
+        browser = self.login_tool.browser
+        if browser is None:
+            return None
+        try:
+            process = psutil.Process(browser.process_id)
+            rss = 0
+            for proc in [process] + process.children(recursive=True):
+                try:
+                    rss += proc.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+        except (psutil.Error, TypeError) as e:
+            logger.debug(f"Failed to read browser memory: {e}")
+            rss = 0
+        return rss, browser.tabs_count
+
+    def _close_extra_tabs(self):
+        browser = self.login_tool.browser
+        keep = self.login_tool.tab
+        closed = 0
+        for tab in browser.get_tabs():
+            if keep is not None and tab.tab_id == keep.tab_id:
+                continue
+            tab.close()
+            closed += 1
+        if closed:
+            logger.info(f"Closed {closed} extra browser tabs")
+
+    def check(self):
+        """检查并在需要时回收浏览器，返回是否重启了浏览器"""
+        usage = self.usage()
+        if usage is None:
+            metrics.BROWSER_RSS.set(0)
+            return False
+        rss, tabs = usage
+        metrics.BROWSER_RSS.set(rss)
+        logger.debug(f"Browser RSS {rss / 1024 ** 2:.0f} MiB, {tabs} tabs")
+
+        if self.max_tabs and tabs > self.max_tabs:
+            self._close_extra_tabs()
+            usage = self.usage()
+            if usage is not None:
+                rss, _ = usage
+
+        reason = None
+        if self.max_rss and rss > self.max_rss:
+            reason = f'RSS {rss / 1024 ** 2:.0f} MiB over {self.max_rss / 1024 ** 2:.0f} MiB'
+        else:
+            started = self.login_tool.browser_started_at
+            if self.max_age and started is not None and time.monotonic() - started > self.max_age:
+                reason = f'running for more than {self.max_age / 3600:.0f}h'
+        if reason is None:
+            return False
+
+        logger.info(f"Recycling browser: {reason}")
+        self.login_tool.restart_browser()
+        metrics.BROWSER_RECYCLES.inc()
+        return True
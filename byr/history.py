@@ -0,0 +1,120 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class YieldHistory:
+    """做种任务上传情况的时间序列（SQLite），按 sync/maindata 的增量变化采样"""
+
+    def __init__(self, state, path='./data/history.db', sample_interval=300,
+                 raw_retention=86400, retention=14 * 86400, bucket=3600):
+        self.state = state  # MainDataState
+        self.path = path
+        self.sample_interval = sample_interval
+        self.raw_retention = raw_retention  # 超过该时长的数据按 bucket 降采样
+        self.retention = retention
+        self.bucket = bucket
+        self._last_sample = None
+        self._last_compact = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS samples ('
+            'hash TEXT NOT NULL, '
+            'ts INTEGER NOT NULL, '
+            'uploaded INTEGER NOT NULL, '
+            'upspeed INTEGER NOT NULL, '
+            'num_leechs INTEGER NOT NULL, '
+            'state TEXT NOT NULL, '
+            'PRIMARY KEY (hash, ts)) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts)')
+
+    def close(self):
+        self._conn.close()
+
+    def sample(self, force=False):
+        """记录自上次采样以来发生变化的任务，返回写入的样本数"""
+        now = time.monotonic()
+        if not force and self._last_sample is not None and now - self._last_sample < self.sample_interval:
+            return 0
+
+        self.state.sync()
+        dirty = self.state.pop_dirty()
+        ts = int(time.time())
+        rows = list()
+        for torrent_hash in dirty:
+            fields = self.state.torrents.get(torrent_hash)
+            if fields is None:
+                continue
+            rows.append((torrent_hash, ts, fields.get('uploaded', 0), fields.get('upspeed', 0),
+                         fields.get('num_leechs', 0), fields.get('state', '')))
+
+        with self._lock:
+            if rows:
+                self._conn.executemany('INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._last_sample = now
+            if self._last_compact is None or now - self._last_compact >= self.bucket:
+                self._compact(ts)
+                self._last_compact = now
+        logger.debug(f"Sampled {len(rows)} changed torrents")
+        return len(rows)
+
+    def _compact(self, ts):
+        # 每个任务始终保留最新一条样本，作为计算速率的基准
+        latest = 'SELECT hash, MAX(ts) FROM samples GROUP BY hash'
+        deleted = self._conn.execute(
+            f'DELETE FROM samples WHERE ts < ? AND (hash, ts) NOT IN ({latest})',
+            (ts - self.retention,),
+        ).rowcount
+        # 较旧的数据每个 bucket 只保留最后一条
+        cutoff = ts - self.raw_retention
+        deleted += self._conn.execute(
+            f'DELETE FROM samples WHERE ts < ? AND (hash, ts) NOT IN ('
+            f'SELECT hash, MAX(ts) FROM samples WHERE ts < ? GROUP BY hash, ts / ?) '
+            f'AND (hash, ts) NOT IN ({latest})',
+            (cutoff, cutoff, self.bucket),
+        ).rowcount
+        if deleted:
+            logger.debug(f"Compacted {deleted} history samples")
+
+    def upload_rates(self, window=6 * 3600):
+        """窗口内的平均上传速率（字节/秒），按 hash 返回；缺少历史数据的任务不在结果中"""
+        now = int(time.time())
+        start = now - window
+        with self._lock:
+            # 窗口开始前的最后一条样本；没有时用窗口内最早的样本
+            baseline = {h: (uploaded, ts) for h, uploaded, ts in self._conn.execute(
+                'SELECT hash, uploaded, MAX(ts) FROM samples WHERE ts <= ? GROUP BY hash', (start,))}
+            for h, uploaded, ts in self._conn.execute(
+                    'SELECT hash, uploaded, MIN(ts) FROM samples WHERE ts > ? GROUP BY hash', (start,)):
+                baseline.setdefault(h, (uploaded, ts))
+
+        rates = dict()
+        for torrent_hash, (uploaded, ts) in baseline.items():
+            fields = self.state.torrents.get(torrent_hash)
+            if fields is None:
+                continue
+            # 基准早于窗口开始时，视为期间匀速上传
+            span = now - ts
+            if span < self.sample_interval:
+                continue
+            rates[torrent_hash] = max(0, fields.get('uploaded', 0) - uploaded) / span
+        return rates
+
+    def average_leechers(self, window=6 * 3600):
+        """窗口内每个任务连接的平均下载者数"""
+        with self._lock:
+            return {h: avg for h, avg in self._conn.execute(
+                'SELECT hash, AVG(num_leechs) FROM samples WHERE ts > ? GROUP BY hash',
+                (int(time.time()) - window,))}
@@ -5,10 +5,30 @@ import shutil
 import time
 from urllib.parse import urljoin
 
-from DrissionPage import Chromium, ChromiumOptions
-
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
+
+# 关闭登录和抓取用不到的子系统，降低内存占用
+LEAN_ARGUMENTS = [
+    '--no-first-run',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-breakpad',
+    '--disable-client-side-phishing-detection',
+    '--disable-domain-reliability',
+    '--disable-hang-monitor',
+    '--disable-notifications',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,InterestFeedContentSuggestions',
+    '--metrics-recording-only',
+    '--renderer-process-limit=2',
+    '--disk-cache-size=33554432',
+    '--js-flags=--max-old-space-size=256',
+]
+
 class LoginTool:
 
     def __init__(self):
@@ -17,26 +37,52 @@ class LoginTool:
         self.chromium_user_data_path = r'./data/cache/drission_page'
         self.chromium_cache_path = r'./data/cache/drission_page_cache'
         self.chromium_proxy = os.getenv("BROWSER_PROXY")
-        self.chromium_options = self.init_chromium_options()
-        self.browser = Chromium(addr_or_opts=self.chromium_options)
-        self.tab = self.browser.latest_tab
+        # 浏览器在第一次需要时才启动，会话 Cookie 有效时整个运行期间都不会启动
+        self.chromium_options = None
+        self.browser = None
+        self.tab = None
+        self.browser_started_at = None
         self.logout_url = ''
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
+    def _ensure_browser(self):
+        # 浏览器可能在 HTTP 扫描模式下被关闭，需要时重新启动
+        if self.browser is None:
+            from DrissionPage import Chromium  # 导入较慢，只在启动浏览器时导入
+            if self.chromium_options is None:
+                self.chromium_options = self.init_chromium_options()
+            self.browser = Chromium(addr_or_opts=self.chromium_options)
+            self.tab = self.browser.latest_tab
+            self.browser_started_at = time.monotonic()
+
     def close(self):
         if self.browser is not None:
             self.browser.quit()
             self.browser = None
         self.tab = None
+        self.browser_started_at = None
+
+    def restart_browser(self):
+        """重启浏览器以释放内存，保留登录 Cookie"""
+        cookies = self.get_cookies()
+        self.close()
+        self._ensure_browser()
+        if cookies:
+            self.browser.set.cookies(cookies)
+        logger.info('Browser restarted.')
+        return self.tab
 
     def init_chromium_options(self):
+        from DrissionPage import ChromiumOptions
         chromium_options = (ChromiumOptions().set_paths(
             user_data_path=self.chromium_user_data_path,
             cache_path=self.chromium_cache_path,
         ).no_imgs(True).mute(True).auto_port(True)
-        .set_user_agent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'))
+        .set_user_agent(USER_AGENT))
+        for argument in LEAN_ARGUMENTS:
+            chromium_options = chromium_options.set_argument(argument)
 
         if self.chromium_proxy is not None:
             chromium_options.set_proxy(self.chromium_proxy)
@@ -69,6 +115,7 @@ class LoginTool:
         return urljoin(self.base_url, url_path)
 
     def clear_browser(self):
+        self._ensure_browser()
         self.tab.close()
         self.tab = self.browser.new_tab()
 
@@ -81,6 +128,7 @@ class LoginTool:
         logger.info('Browser cleared successfully!')
 
     def login(self):
+        self._ensure_browser()
         if self.tab.get(self.base_url, retry=5) is False:
             logger.error('Failed to access the website: %s', self.base_url)
             return None
@@ -105,10 +153,22 @@ class LoginTool:
         return self.tab
 
     def retry_login(self):
+        # 浏览器中的会话仍有效时 login() 不会提交表单；只有登录失败时才清空浏览器数据重试
+        page = self.login()
+        if page is not None:
+            return page
         self.clear_browser()
         return self.login()
 
+    def get_cookies(self):
+        """获取当前标签页的登录 Cookie"""
+        if self.tab is None:
+            return []
+        return list(self.tab.cookies(all_info=True))
+
     def logout(self) -> bool:
+        if self.tab is None:
+            return False
         if self.logout_url != '' and self.tab.get(self.logout_url, retry=5):
             logger.info('Logout success!')
             self.logout_url = ''
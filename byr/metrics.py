@@ -0,0 +1,234 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = dict()  # 标签值 -> 数值
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可任意设置的瞬时值"""
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    """按分桶累计的观测值分布"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = list()
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {total!r}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = dict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Duplicate metric: {metric.name}')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = list()
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+SCAN_SECONDS = REGISTRY.histogram('byr_scan_duration_seconds', 'Time spent fetching and parsing torrent lists')
+SCANS = REGISTRY.counter('byr_scans_total', 'Torrent list scans by result', ('result',))
+LAST_SCAN = REGISTRY.gauge('byr_last_scan_timestamp_seconds', 'Unix time of the last successful scan')
+PARSE_SECONDS = REGISTRY.histogram('byr_parse_duration_seconds', 'Time spent parsing one torrent list page')
+CANDIDATES = REGISTRY.counter('byr_candidates_total', 'Free torrents by selection stage',
+                              ('stage',))  # found / selected / admitted
+TORRENT_FETCH_SECONDS = REGISTRY.histogram('byr_torrent_fetch_duration_seconds', 'Latency of .torrent downloads')
+CLIENT_REQUEST_SECONDS = REGISTRY.histogram('byr_client_request_duration_seconds',
+                                            'qBittorrent Web API latency per endpoint', ('endpoint',))
+LOGINS = REGISTRY.counter('byr_logins_total', 'Browser logins to the site')
+EVICTED_BYTES = REGISTRY.counter('byr_evicted_bytes_total', 'Bytes freed by removing torrents')
+EVICTED_TORRENTS = REGISTRY.counter('byr_evicted_torrents_total', 'Torrents removed to free space')
+FREE_SPACE = REGISTRY.gauge('byr_free_space_bytes', 'Free space available for new torrents')
+START_QUEUE = REGISTRY.gauge('byr_start_queue_length', 'Added torrents waiting to be started')
+SHARD_FREE_SPACE = REGISTRY.gauge('byr_shard_free_space_bytes', 'Free space per qBittorrent client in a pool',
+                                  ('shard',))
+BROWSER_RSS = REGISTRY.gauge('byr_browser_rss_bytes', 'Resident memory of the browser process tree')
+BROWSER_RECYCLES = REGISTRY.counter('byr_browser_recycles_total', 'Browser restarts by the governor')
+
+
+def observe_client_response(response, *args, **kwargs):
+    """requests 的 response 钩子，按接口记录 qBittorrent 请求耗时"""
+    endpoint = urlsplit(response.url).path.removeprefix('/api/v2/')
+    CLIENT_REQUEST_SECONDS.observe(response.elapsed.total_seconds(), endpoint=endpoint)
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 和 /healthz"""
+
+    def __init__(self, port, host='127.0.0.1', registry=REGISTRY, health=None):
+        self.registry = registry
+        self.health = health  # 返回 (是否健康, 详情 dict) 的回调
+        handler = type('Handler', (_Handler,), {'server_ref': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._thread.start()
+        logger.info('Metrics server listening on http://%s:%d', *self.address)
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_ref = None  # 由 MetricsServer 注入
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            return self._send(200, self.server_ref.registry.render(), 'text/plain; version=0.0.4; charset=utf-8')
+        if path == '/healthz':
+            healthy, details = (True, {}) if self.server_ref.health is None else self.server_ref.health()
+            body = json.dumps(dict(details, status='ok' if healthy else 'stalled'))
+            return self._send(200 if healthy else 503, body, 'application/json')
+        return self._send(404, 'Not Found\n', 'text/plain')
@@ -0,0 +1,78 @@
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+
+class Promo(Enum):
+    """促销类型，值为站点上显示的标签"""
+    NONE = ''
+    FREE = '免费'
+    TWOUP = '2x上传'
+    TWOUP_FREE = '免费&2x上传'
+    HALFDOWN = '50%下载'
+    TWOUP_HALFDOWN = '50%下载&2x上传'
+    THIRTYPERCENTDOWN = '30%下载'
+
+    @property
+    def is_free(self):
+        return self in (Promo.FREE, Promo.TWOUP_FREE)
+
+    @property
+    def upload_factor(self):
+        """上传量计算倍率"""
+        return 2.0 if self in (Promo.TWOUP, Promo.TWOUP_FREE, Promo.TWOUP_HALFDOWN) else 1.0
+
+    @property
+    def download_factor(self):
+        """下载量计算倍率"""
+        if self.is_free:
+            return 0.0
+        if self in (Promo.HALFDOWN, Promo.TWOUP_HALFDOWN):
+            return 0.5
+        if self is Promo.THIRTYPERCENTDOWN:
+            return 0.3
+        return 1.0
+
+    @classmethod
+    def from_label(cls, label):
+        try:
+            return cls(label)
+        except ValueError:
+            return cls.NONE
+
+
+_SIZE_RE = re.compile(r'([\d.,]+)\s*([KMGTP]?i?B)', re.IGNORECASE)
+_SIZE_UNITS = {'K': 1, 'M': 2, 'G': 3, 'T': 4, 'P': 5}
+
+
+def parse_size(text):
+    """将 '1.23 GiB' 形式的大小转换为字节数，无法解析时返回 -1"""
+    match = _SIZE_RE.search(text)
+    if match is None:
+        return -1
+    try:
+        number = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return -1
+    prefix = match.group(2)[0].upper()
+    exponent = _SIZE_UNITS.get(prefix, 0)
+    return int(number * 1024 ** exponent)
+
+
+@dataclass(slots=True)
+class TorrentListing:
+    """种子列表中的一行"""
+    seed_id: str
+    title: str
+    cat: str
+    promo: Promo
+    size: int  # 字节，无法解析时为 -1
+    seeding: int  # 无法解析时为 -1
+    downloading: int
+    finished: int
+    is_hot: bool = False
+    is_new: bool = False
+    is_recommended: bool = False
+    is_seeding: bool = False
+    is_finished: bool = False
+    download_url: str = ''  # RSS 订阅中带 passkey 的下载链接，为空时使用 download.php?id=
@@ -0,0 +1,354 @@
+import dataclasses
+import logging
+import re
+import threading
+
+from lxml import html as lxml_html
+
+from byr.models import Promo, TorrentListing, parse_size
+
+logger = logging.getLogger(__name__)
+
+# 促销标记 class 到促销类型的映射
+TAG_MAP = {
+    # highlight & tag
+    'free': Promo.FREE,
+    'twoup': Promo.TWOUP,
+    'twoupfree': Promo.TWOUP_FREE,
+    'halfdown': Promo.HALFDOWN,
+    'twouphalfdown': Promo.TWOUP_HALFDOWN,
+    'thirtypercentdown': Promo.THIRTYPERCENTDOWN,
+    # icon
+    '2up': Promo.TWOUP,
+    'free2up': Promo.TWOUP_FREE,
+    '50pctdown': Promo.HALFDOWN,
+    '50pctdown2up': Promo.TWOUP_HALFDOWN,
+    '30pctdown': Promo.THIRTYPERCENTDOWN,
+}
+
+_ID_RE = re.compile(r'id=(\d+)')
+_START_IDX = 1  # static offset，tds[0] 是引用
+
+_TORRENTS_TABLE_RE = re.compile(r'<table\b[^>]*\bclass=["\']?torrents\b', re.IGNORECASE)
+_INFO_BLOCK_RE = re.compile(r'<div\b[^>]*\bid=["\']?info_block\b', re.IGNORECASE)
+# 分组序号：1 <table，2 </table>，3 <tr，4 </tr>
+_TABLE_TOKEN_RE = re.compile(r'<(?:(table)|(/table)|(tr)|(/tr))\b', re.IGNORECASE)
+_TD_TOKEN_RE = re.compile(r'<(/?)td\b', re.IGNORECASE)
+_CELL_RE = re.compile(r'<td\b[^>]*>(.*?)</td>', re.IGNORECASE | re.DOTALL)
+_TAG_STRIP_RE = re.compile(r'<[^>]+>')
+
+
+def get_tag(tag):
+    if not tag:
+        return Promo.NONE
+    return TAG_MAP.get(tag.split('_')[0], Promo.NONE)
+
+
+def _first_class(element):
+    classes = element.get('class')
+    if not classes:
+        return None
+    return classes.split()[0] if classes.strip() else ''
+
+
+def _count(td):
+    text = td.text_content().strip()
+    return int(text) if text.isdigit() else -1
+
+
+def _parse_row(row, tds):
+    # 主要信息的 td
+    main_td = tds[_START_IDX + 1]
+    link = next(main_td.iter('a'), None)
+    if link is None:
+        return None
+    href = (link.get('href') or '').strip()
+    match = _ID_RE.search(href)
+    if match is None:
+        return None
+
+    # 一次遍历主要信息 td，收集文字标记和图标
+    tags = set()
+    is_seeding = False
+    is_finished = False
+    icon_class = None
+    for element in main_td.iter('span', 'img'):
+        if element.tag == 'span':
+            parent = element.getparent()
+            if parent is not None and parent.tag == 'span':
+                tag_class = _first_class(element)
+                if tag_class:
+                    tags.add(tag_class)
+            continue
+        src = element.get('src')
+        if src == '/pic/seeding.png':
+            is_seeding = True
+        elif src == '/pic/finished.png':
+            is_finished = True
+        elif src == '/pic/trans.gif':
+            img_class = _first_class(element)
+            if img_class and img_class.startswith('pro_'):
+                icon_class = img_class
+
+    is_hot = 'hot' in tags
+    is_new = 'new' in tags
+    is_recommended = 'recommended' in tags
+    tags.difference_update(('hot', 'new', 'recommended'))
+
+    # 根据控制面板中促销种子的标记方式不同来匹配
+    row_class = _first_class(row)
+    if row_class is not None:
+        # 默认高亮方式
+        tag = get_tag(row_class)
+    elif len(tags) == 1:
+        # 文字标记方式，不属于 hot、new、recommended 的标记即为促销标记
+        tag = get_tag(next(iter(tags)))
+    elif icon_class is not None:
+        # 添加图标方式
+        tag = get_tag(icon_class.split('_')[-1])
+    else:
+        tag = Promo.NONE
+    if tag is Promo.NONE:
+        return None
+
+    cat_link = next(tds[_START_IDX].iter('a'), None)
+    return TorrentListing(
+        seed_id=match.group(1),
+        title=(link.get('title') or '').strip(),
+        cat=cat_link.text_content().strip() if cat_link is not None else '',
+        promo=tag,
+        size=parse_size(tds[_START_IDX + 4].text_content()),
+        seeding=_count(tds[_START_IDX + 5]),
+        downloading=_count(tds[_START_IDX + 6]),
+        finished=_count(tds[_START_IDX + 7]),
+        is_hot=is_hot,
+        is_new=is_new,
+        is_recommended=is_recommended,
+        is_seeding=is_seeding,
+        is_finished=is_finished,
+    )
+
+
+def parse_torrent_rows(root):
+    """单次遍历种子列表，提取所有促销种子（支持高亮、文字标记、图标三种方式）"""
+    listings = list()
+    for row in root.iter('tr'):
+        listing = _listing_of(row)
+        if listing is not None:
+            listings.append(listing)
+    return listings
+
+
+def _listing_of(row):
+    tds = [child for child in row if child.tag == 'td']
+    if len(tds) < _START_IDX + 8:
+        return None
+    return _parse_row(row, tds)
+
+
+def parse_user_info(root):
+    """提取页面顶部的用户信息文本，找不到时返回 None"""
+    info_block = root.get_element_by_id('info_block', None)
+    if info_block is None:
+        return None
+    user_data = info_block.find_class('navbar-user-data')
+    if not user_data:
+        return None
+    user_info_block = user_data[0]
+    nowrap = user_info_block.find_class('nowrap')
+    user_name = nowrap[0].text_content() if nowrap else ''
+
+    user_info_text = user_info_block.text_content()
+    index_s = user_info_text.find('等级')
+    index_e = user_info_text.find('当前活动')
+    if index_s == -1 or index_e == -1:
+        return None
+    user_info_text = user_info_text[index_s:index_e]
+    user_info_text = re.sub(r"[\xa0\n]+", ' ', user_info_text)
+    user_info_text = re.sub(r'\[[^]]*]', '', user_info_text)
+    user_info_text = re.sub(r'\s*[:：]\s*', ':', user_info_text)
+    user_info_text = re.sub(r'\s+', ' ', user_info_text).strip()
+    return f"用户名:{user_name} {user_info_text}"
+
+
+def parse_page(html):
+    """解析种子列表页面，返回 (用户信息, 促销种子列表)"""
+    root = lxml_html.fromstring(html)
+    try:
+        user_info = parse_user_info(root)
+    except Exception as e:
+        logger.error(f"Failed to retrieve user info: {e}")
+        user_info = None
+    return user_info, parse_torrent_rows(root)
+
+
+def _element_end(html, start, tag):
+    """返回从 start 开始的 tag 元素（含嵌套）结束标签之后的位置，找不到时返回 -1"""
+    depth = 0
+    for match in re.compile(rf'<(/?){tag}\b', re.IGNORECASE).finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            end = html.find('>', match.end())
+            return -1 if end == -1 else end + 1
+    return -1
+
+
+def split_rows(html, start=0):
+    """从 start 处的 <table> 开始按顶层 <tr> 切分表格，返回 (行 HTML 列表, 表格结束位置)
+
+    嵌套表格中的行属于所在的顶层行；表格没有闭合时结束位置为 -1。
+    """
+    rows = list()
+    depth = 0
+    row_start = None
+    for match in _TABLE_TOKEN_RE.finditer(html, start):
+        kind = match.lastindex
+        if kind == 1:
+            depth += 1
+        elif kind == 2:
+            depth -= 1
+            if depth == 0:
+                if row_start is not None:
+                    rows.append(html[row_start:match.start()])
+                return rows, html.find('>', match.end()) + 1
+        elif depth != 1:
+            continue
+        elif kind == 3:
+            # 省略了 </tr> 的行在下一行开始处结束
+            if row_start is not None:
+                rows.append(html[row_start:match.start()])
+            row_start = match.start()
+        elif row_start is not None:
+            end = html.find('>', match.end()) + 1
+            rows.append(html[row_start:end])
+            row_start = None
+    return rows, -1
+
+
+def split_volatile(row):
+    """将 split_rows 切分出的行分为稳定部分和易变的人数，返回 (稳定部分, (做种, 下载, 完成))，结构不符时返回 None
+
+    稳定部分为主要信息 td 及之前的内容（种子 ID、标题、促销标记）加上大小；评论数、存活时间和人数
+    几乎每次轮询都会变化，不计入其中。
+    """
+    depth = 0
+    closed = 0
+    main_end = -1
+    for match in _TD_TOKEN_RE.finditer(row):
+        if not match.group(1):
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            closed += 1
+            if closed == _START_IDX + 2:
+                main_end = match.end()
+                break
+    if main_end == -1:
+        return None
+    # 之后依次为评论、存活时间、大小、做种、下载、完成
+    cells = [_TAG_STRIP_RE.sub('', match.group(1)).strip() for match in _CELL_RE.finditer(row, main_end)]
+    if len(cells) < 6:
+        return None
+    counts = tuple(int(text) if text.isdigit() else -1 for text in cells[3:6])
+    return row[:main_end] + cells[2], counts
+
+
+def parse_rows(rows):
+    """批量解析 split_rows 切分出的行，返回与 rows 一一对应的 TorrentListing（非促销行为 None）"""
+    root = lxml_html.fragment_fromstring(f'<table>{"".join(rows)}</table>')
+    elements = root.xpath('./tr | ./tbody/tr')
+    if len(elements) != len(rows):
+        # 行结构不规整时逐行解析
+        if len(rows) == 1:
+            return [None]
+        return [parse_rows([row])[0] for row in rows]
+    return [_listing_of(element) for element in elements]
+
+
+class PageCache:
+    """按行缓存种子列表的解析结果：稳定部分与上一轮相同的行直接复用并只更新人数，只解析新增或变化的行
+
+    用户信息区域同样按内容缓存。每轮扫描前调用 begin()，changed 记录本轮新增或标题、大小、促销变化的种子 ID。
+    """
+
+    def __init__(self):
+        self._rows = dict()  # 行的稳定部分（见 split_volatile）-> TorrentListing，非促销行为 None
+        self._previous = dict()
+        self._user_info = (None, None)  # (用户信息区域 HTML, 用户信息)
+        self._lock = threading.Lock()
+        self.changed = set()
+
+    def begin(self):
+        """开始新一轮扫描，只保留上一轮出现过的行"""
+        with self._lock:
+            self._previous, self._rows = self._rows, dict()
+            self.changed = set()
+
+    def _user_info_of(self, html):
+        match = _INFO_BLOCK_RE.search(html)
+        if match is None:
+            return None
+        end = _element_end(html, match.start(), 'div')
+        if end == -1:
+            return None
+        region = html[match.start():end]
+        cached_region, user_info = self._user_info
+        if region == cached_region:
+            return user_info
+        try:
+            user_info = parse_user_info(lxml_html.fragment_fromstring(region))
+        except Exception as e:
+            logger.error(f"Failed to retrieve user info: {e}")
+            user_info = None
+        self._user_info = (region, user_info)
+        return user_info
+
+    def _rows_of(self, rows):
+        results = [None] * len(rows)
+        keys = [None] * len(rows)
+        missing = list()
+        with self._lock:
+            for i, row in enumerate(rows):
+                split = split_volatile(row)
+                key, counts = split if split is not None else (row, None)
+                keys[i] = key
+                if key in self._rows:
+                    listing = self._rows[key]
+                elif key in self._previous:
+                    listing = self._rows[key] = self._previous[key]
+                else:
+                    missing.append(i)
+                    continue
+                if listing is not None and counts is not None \
+                        and counts != (listing.seeding, listing.downloading, listing.finished):
+                    # 只有人数变化：更新人数，不算作变化的种子
+                    listing = self._rows[key] = dataclasses.replace(
+                        listing, seeding=counts[0], downloading=counts[1], finished=counts[2])
+                results[i] = listing
+        if not missing:
+            return results, 0
+
+        parsed = parse_rows([rows[i] for i in missing])
+        with self._lock:
+            for i, listing in zip(missing, parsed, strict=True):
+                results[i] = self._rows[keys[i]] = listing
+                if listing is not None:
+                    self.changed.add(listing.seed_id)
+        return results, len(missing)
+
+    def parse(self, html):
+        """与 parse_page 相同，返回 (用户信息, 促销种子列表)"""
+        match = _TORRENTS_TABLE_RE.search(html)
+        rows, end = split_rows(html, match.start()) if match is not None else ([], -1)
+        if end == -1:
+            # 找不到种子列表区域时退回整页解析
+            user_info, listings = parse_page(html)
+            with self._lock:
+                self.changed.update(listing.seed_id for listing in listings)
+            return user_info, listings
+
+        results, parsed = self._rows_of(rows)
+        listings = [listing for listing in results if listing is not None]
+        logger.debug(f"Parsed {parsed} changed rows, {len(listings)} promoted torrents")
+        return self._user_info_of(html), listings
@@ -0,0 +1,81 @@
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+
+class TorrentRanker:
+    """为候选种子估计上传收益，并在空间预算内选出总收益最高的一组（0/1 背包）"""
+
+    def __init__(self, max_count=10, min_score=0.0, hot_bonus=1.5, new_bonus=1.2,
+                 cat_weight=None, max_units=256):
+        self.max_count = max_count  # 单次扫描最多选择的种子数
+        self.min_score = min_score
+        self.hot_bonus = hot_bonus
+        self.new_bonus = new_bonus
+        self.cat_weight = cat_weight  # 分类 -> 收益倍率
+        self.max_units = max_units  # 背包容量最多划分的份数，限制计算量
+
+    def score(self, listing):
+        """预期上传收益：需求（下载者/做种者）随体积次线性增长，按促销倍率和热门、新种加成"""
+        # 平滑处理，刚发布还没有下载者的种子也有基础收益
+        demand = (max(listing.downloading, 0) + 1) / (max(listing.seeding, 0) + 1)
+        size_gb = max(listing.size, 0) / GIB
+        value = demand * math.sqrt(max(size_gb, 0.1)) * listing.promo.upload_factor
+        if listing.is_hot:
+            value *= self.hot_bonus
+        if listing.is_new:
+            value *= self.new_bonus
+        if self.cat_weight is not None:
+            value *= self.cat_weight(listing.cat)
+        return value
+
+    def rank(self, listings):
+        """按收益从高到低排序，返回 [(score, listing)]"""
+        scored = [(self.score(listing), listing) for listing in listings]
+        scored = [item for item in scored if item[0] > self.min_score]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    def select(self, listings, capacity):
+        """在 capacity 字节内选出总收益最高且不超过 max_count 个的种子，按收益降序返回"""
+        ranked = self.rank(listings)
+        if capacity is None:
+            return [listing for _, listing in ranked[:self.max_count]]
+        if capacity <= 0 or not ranked:
+            return []
+
+        # 体积向上取整到份数，保证所选组合不会超出容量
+        unit = max(GIB, math.ceil(capacity / self.max_units))
+        slots = capacity // unit
+        items = [(max(1, math.ceil(listing.size / unit)), score, listing) for score, listing in ranked]
+        items = [item for item in items if item[0] <= slots]
+
+        # best[k][w]：最多选 k 个、占用不超过 w 份时的最大收益；taken 记录每个种子在哪些状态下被选中，用于回溯
+        count = min(self.max_count, len(items))
+        best = [[0.0] * (slots + 1) for _ in range(count + 1)]
+        taken = list()
+        for weight, score, _ in items:
+            flags = [None] * (count + 1)
+            for k in range(count, 0, -1):
+                row, prev = best[k], best[k - 1]
+                tail = row[weight:]
+                candidates = [value + score for value in prev[:len(tail)]]
+                flags[k] = bytearray(weight) + bytearray([c > r for c, r in zip(candidates, tail)])
+                row[weight:] = [c if c > r else r for c, r in zip(candidates, tail)]
+            taken.append(flags)
+
+        chosen = list()
+        k, w = count, slots
+        for i in range(len(items) - 1, -1, -1):
+            if k > 0 and taken[i][k][w]:
+                chosen.append(items[i][2])
+                w -= items[i][0]
+                k -= 1
+        total = best[count][slots]
+        logger.debug(f"Selected {len(chosen)}/{len(ranked)} torrents, total score {total:.2f}, "
+                     f"{sum(listing.size for listing in chosen) / GIB:.1f}/{capacity / GIB:.1f} GiB")
+        order = {id(listing): i for i, (_, listing) in enumerate(ranked)}
+        return sorted(chosen, key=lambda listing: order[id(listing)])
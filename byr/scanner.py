@@ -0,0 +1,86 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urljoin
+
+from byr.metrics import PARSE_SECONDS
+from byr.parser import PageCache
+from byr.session import SessionExpired
+
+logger = logging.getLogger(__name__)
+
+
+class Scanner:
+    """并发扫描多个分类的种子列表，每个分类翻到出现已处理种子的页面时停止"""
+
+    def __init__(self, site, base_url, is_seen, max_pages=3, categories=(), workers=4):
+        self.site = site
+        self.base_url = base_url
+        self.is_seen = is_seen  # 判断种子是否已处理过的回调
+        self.max_pages = max(1, max_pages)
+        self.categories = list(categories) or [None]
+        self.workers = max(1, workers)
+        self.cache = PageCache()  # 未变化的行复用上一轮的解析结果
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scanner')
+
+    @property
+    def changed(self):
+        """上一次扫描中新增或变化的种子 ID"""
+        return self.cache.changed
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def page_url(self, category, page):
+        params = dict()
+        if category is not None:
+            params['cat'] = category
+        if page > 0:
+            params['page'] = page
+        query = f'?{urlencode(params)}' if params else ''
+        return urljoin(self.base_url, f'torrents.php{query}')
+
+    def _fetch(self, category, page):
+        html = self.site.get_html(self.page_url(category, page))
+        with PARSE_SECONDS.time():
+            return self.cache.parse(html)
+
+    def scan(self):
+        """返回 (用户信息, 去重后的促销种子列表)；会话失效时抛出 SessionExpired"""
+        self.cache.begin()
+        user_info = None
+        listings = dict()
+        pages = {category: 0 for category in self.categories}  # 每个分类下一次要获取的页码
+
+        while pages:
+            # 每个分类一次只获取一页，确认上一页的种子都未处理过后才翻下一页；不同分类之间并发
+            futures = {category: self._executor.submit(self._fetch, category, page)
+                       for category, page in pages.items()}
+            for category, future in futures.items():
+                page = pages[category]
+                try:
+                    page_user_info, page_listings = future.result()
+                except SessionExpired:
+                    raise
+                except Exception as e:
+                    if page == 0:
+                        raise
+                    logger.warning(f"Failed to scan page {page} of category {category}: {repr(e)}")
+                    del pages[category]
+                    continue
+
+                if user_info is None:
+                    user_info = page_user_info
+                seen_count = 0
+                for listing in page_listings:
+                    listings.setdefault(listing.seed_id, listing)
+                    if self.is_seen(listing):
+                        seen_count += 1
+                logger.debug(f"Scanned category {category} page {page}: "
+                             f"{len(page_listings)} promoted, {seen_count} seen")
+                # 本页出现处理过的种子，说明已翻到上一轮扫描的范围
+                if seen_count or page + 1 >= self.max_pages:
+                    del pages[category]
+                else:
+                    pages[category] = page + 1
+
+        return user_info, list(listings.values())
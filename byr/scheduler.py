@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import random
+import time
+
+from byr.backoff import Backoff
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(listings):
+    """促销种子列表的指纹，用于判断页面是否变化"""
+    digest = hashlib.blake2b(digest_size=16)
+    for seed_id, promo in sorted((listing.seed_id, listing.promo.value) for listing in listings):
+        digest.update(f'{seed_id}:{promo};'.encode())
+    return digest.hexdigest()
+
+
+class ScanScheduler:
+    """自适应扫描调度：出现新种子时缩短间隔，页面无变化时逐步放慢，失败时指数退避"""
+
+    def __init__(self, base_interval=45, min_interval=15, max_interval=180,
+                 space_check_fallback=6 * 3600, jitter=0.1):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = base_interval
+        self.jitter = jitter
+        self.failures = 0
+        self._backoff = Backoff(base=2.0, max_delay=max_interval, jitter=0.3)
+        self._fingerprint = None
+
+        # 空间检查由事件触发，长时间没有事件时兜底检查一次
+        self.space_check_fallback = space_check_fallback
+        self._space_check_reasons = {'startup'}
+        self._last_space_check = None
+
+    def on_scan(self, listings, new_count):
+        """扫描成功后根据结果调整间隔"""
+        self.failures = 0
+        current = fingerprint(listings)
+        changed = current != self._fingerprint
+        if new_count > 0:
+            self.interval = self.min_interval
+        elif not changed:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        else:
+            self.interval = max(self.min_interval, min(self.base_interval, self.interval))
+        self._fingerprint = current
+        logger.debug(f"Next scan in {self.interval:.0f}s ({new_count} new, {'changed' if changed else 'unchanged'})")
+
+    def on_failure(self):
+        """扫描失败，返回退避等待的秒数"""
+        delay = self._backoff.delay(self.failures)
+        self.failures += 1
+        return delay
+
+    def next_delay(self):
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def request_space_check(self, reason):
+        self._space_check_reasons.add(reason)
+
+    def space_check_due(self):
+        if self._space_check_reasons:
+            return True
+        return self._last_space_check is None or \
+            time.monotonic() - self._last_space_check > self.space_check_fallback
+
+    def space_check_reasons(self):
+        return ', '.join(sorted(self._space_check_reasons)) or 'periodic'
+
+    def space_checked(self):
+        self._space_check_reasons.clear()
+        self._last_space_check = time.monotonic()
@@ -0,0 +1,137 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SeenIndex:
+    """持久化的已处理种子索引：SQLite 存储 + 内存哈希表查询"""
+
+    # 这些结果表示无需再次处理；空间不足等临时结果在下次扫描时会重试
+    FINAL_OUTCOMES = frozenset({'added', 'exists', 'invalid', 'oversized'})
+
+    def __init__(self, path='./data/seen.db', ttl_days=30, max_entries=20000, purge_interval=3600):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval  # 常驻运行时每隔该时长（秒）在写入时清除过期记录
+        self._last_purge = 0.0
+        self._entries = dict()  # seed_id -> (infohash, outcome, promo, updated_at)
+        self._cats = dict()  # infohash -> 分类
+        self._hash_index = dict()  # infohash -> seed_id
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'seed_id TEXT PRIMARY KEY, '
+            'infohash TEXT, '
+            'outcome TEXT NOT NULL, '
+            'promo TEXT NOT NULL DEFAULT \'\', '
+            'updated_at REAL NOT NULL)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(seen)')}
+        if 'cat' not in columns:
+            self._conn.execute('ALTER TABLE seen ADD COLUMN cat TEXT NOT NULL DEFAULT \'\'')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_seen_updated_at ON seen (updated_at)')
+        self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        self._evict_expired()
+        rows = self._conn.execute('SELECT seed_id, infohash, outcome, promo, updated_at, cat FROM seen').fetchall()
+        for seed_id, infohash, outcome, promo, updated_at, cat in rows:
+            self._entries[seed_id] = (infohash, outcome, promo, updated_at)
+            if infohash:
+                self._hash_index[infohash] = seed_id
+                if cat:
+                    self._cats[infohash] = cat
+        logger.debug(f"Loaded {len(self._entries)} seen torrents in {time.perf_counter() - started:.3f}s")
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, seed_id):
+        entry = self._entries.get(seed_id)
+        return entry is not None and entry[1] in self.FINAL_OUTCOMES
+
+    def outcome(self, seed_id):
+        entry = self._entries.get(seed_id)
+        return entry[1] if entry is not None else None
+
+    def promo_of(self, infohash):
+        """按 infohash 查询添加时的促销类型"""
+        seed_id = self._hash_index.get(infohash)
+        if seed_id is None:
+            return ''
+        return self._entries[seed_id][2]
+
+    def cat_of(self, infohash):
+        """按 infohash 查询种子分类"""
+        return self._cats.get(infohash, '')
+
+    def added_hashes(self):
+        """已添加到客户端的种子 infohash"""
+        # 工作线程中调用时 record 可能同时修改索引，先在锁内复制
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry[0] for entry in entries if entry[0] and entry[1] in ('added', 'exists')]
+
+    def record(self, seed_id, outcome, infohash=None, promo='', cat=''):
+        """记录种子的处理结果"""
+        with self._lock:
+            now = time.time()
+            old = self._entries.get(seed_id)
+            if infohash is None and old is not None:
+                infohash = old[0]
+            self._entries[seed_id] = (infohash, outcome, promo, now)
+            if infohash:
+                self._hash_index[infohash] = seed_id
+                if cat:
+                    self._cats[infohash] = cat
+            self._conn.execute(
+                'INSERT OR REPLACE INTO seen (seed_id, infohash, outcome, promo, updated_at, cat) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (seed_id, infohash, outcome, promo, now, cat),
+            )
+            if now - self._last_purge >= self.purge_interval:
+                self._evict_expired(now)
+            if len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _forget(self, seed_id):
+        infohash = self._entries.pop(seed_id)[0]
+        if infohash and self._hash_index.get(infohash) == seed_id:
+            del self._hash_index[infohash]
+            self._cats.pop(infohash, None)
+
+    def _evict_expired(self, now=None):
+        # 同时清除内存和数据库中超过 TTL 的记录
+        now = time.time() if now is None else now
+        cutoff = now - self.ttl
+        for seed_id in [seed_id for seed_id, entry in self._entries.items() if entry[3] < cutoff]:
+            self._forget(seed_id)
+        deleted = self._conn.execute('DELETE FROM seen WHERE updated_at < ?', (cutoff,)).rowcount
+        self._last_purge = now
+        if deleted:
+            logger.debug(f"Evicted {deleted} expired seen torrents")
+
+    def _evict_oldest(self):
+        # 超过容量时淘汰最早的 10%，避免每次写入都触发淘汰
+        count = len(self._entries) - int(self.max_entries * 0.9)
+        oldest = sorted(self._entries.items(), key=lambda item: item[1][3])[:count]
+        for seed_id, _ in oldest:
+            self._forget(seed_id)
+        self._conn.executemany('DELETE FROM seen WHERE seed_id = ?', [(seed_id,) for seed_id, _ in oldest])
+        logger.debug(f"Evicted {len(oldest)} oldest seen torrents")
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import time
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 种子文件大小上限，超过视为异常响应
+MAX_TORRENT_FILE_SIZE = 10 * 1024 * 1024
+
+
+class SessionExpired(Exception):
+    """站点会话已失效，需要重新登录"""
+
+
+class TransientError(Exception):
+    """可重试的临时错误（网络异常、超时、响应中途断开、5xx、429）"""
+
+
+class TorrentFetchError(Exception):
+    """不可重试的种子获取错误"""
+
+
+class SiteSession:
+    """复用浏览器登录 Cookie 的 HTTP 会话（连接池 + keep-alive）"""
+
+    def __init__(self, user_agent, proxy=None, pool_size=4, timeout=15):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Connection': 'keep-alive',
+        })
+        if proxy:
+            self.session.proxies = {'http': proxy, 'https': proxy}
+
+    def close(self):
+        self.session.close()
+
+    @property
+    def has_cookies(self):
+        return len(self.session.cookies) > 0
+
+    def load_cookies(self, cookies):
+        """导入浏览器 Cookie（DrissionPage 返回的字典列表）"""
+        self.session.cookies.clear()
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain', ''),
+                path=cookie.get('path', '/'),
+            )
+        logger.debug(f"Loaded {len(self.session.cookies)} cookies into HTTP session")
+
+    def clear_cookies(self):
+        self.session.cookies.clear()
+
+    def save_cookies(self, path):
+        """将 Cookie 写入仅当前用户可读写（0600）的文件"""
+        cookies = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+            for c in self.session.cookies
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.tmp'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, path)
+        logger.debug(f"Saved {len(cookies)} cookies to {path}")
+
+    def load_cookie_file(self, path):
+        """从文件导入未过期的 Cookie，文件不存在或没有可用 Cookie 时返回 False"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                cookies = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read saved cookies: {e}")
+            return False
+        if os.name == 'posix' and os.stat(path).st_mode & 0o077:
+            logger.warning(f"Cookie file {path} is accessible by other users, restricting to 0600")
+            os.chmod(path, 0o600)
+        now = time.time()
+        cookies = [c for c in cookies if not c.get('expires') or c['expires'] > now]
+        if not cookies:
+            return False
+        self.load_cookies(cookies)
+        return True
+
+    def probe(self, url):
+        """检查会话是否有效，不读取页面内容；网络异常或服务端错误时抛出 TransientError"""
+        try:
+            response = self.session.get(url, allow_redirects=False, stream=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TransientError(repr(e)) from e
+        response.close()
+        if response.is_redirect:
+            return not self._is_login_page(urljoin(url, response.headers.get('Location', '')))
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientError(f'HTTP {response.status_code}')
+        return response.ok
+
+    @staticmethod
+    def _is_login_page(url):
+        path = urlparse(url).path.rstrip('/')
+        return path.endswith('login') or path.endswith('login.php')
+
+    def get(self, url, **kwargs):
+        """发送 GET 请求，被重定向到登录页时抛出 SessionExpired"""
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.session.get(url, **kwargs)
+        if self._is_login_page(response.url):
+            response.close()
+            raise SessionExpired(f'Redirected to login page: {response.url}')
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+
+    def get_html(self, url):
+        response = self.get(url)
+        if response.encoding is None or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = response.apparent_encoding
+        return response.text
+
+    def fetch_torrent(self, url, max_size=MAX_TORRENT_FILE_SIZE):
+        """以流式方式将种子文件读入内存，不落盘"""
+        try:
+            response = self.get(url, stream=True)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            if status == 429 or status >= 500:
+                raise TransientError(f'HTTP {status}') from e
+            raise TorrentFetchError(f'HTTP {status}') from e
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            raise TransientError(repr(e)) from e
+
+        with response:
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_size:
+                raise TorrentFetchError(f'Torrent file too large: {content_length} bytes')
+
+            buffer = bytearray()
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    buffer.extend(chunk)
+                    if len(buffer) > max_size:
+                        raise TorrentFetchError(f'Torrent file exceeds {max_size} bytes')
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                raise TransientError(repr(e)) from e
+
+        content = bytes(buffer)
+        # 合法的种子文件是一个 bencode 字典；返回 HTML 说明会话失效或种子不可用
+        if not content.startswith(b'd'):
+            if b'login' in content[:4096].lower():
+                raise SessionExpired('Got login page instead of torrent file')
+            raise TorrentFetchError('Response is not a torrent file')
+        return content
@@ -1,11 +1,14 @@
+import argparse
 import logging
 import os
+import sys
+import time
 
 from dotenv import load_dotenv
 
-from byr.bot import Bot
-from byr.client.qbittorrent import QBittorrent
-from byr.login import LoginTool
+_started = time.perf_counter()  # 启动耗时从这里开始计算；较重的依赖在 main() 中才导入
+
+logger = logging.getLogger(__name__)
 
 
 def configure_logging() -> None:
@@ -22,11 +25,33 @@ def configure_logging() -> None:
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
-if __name__ == '__main__':
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='BYRBT free torrent bot.')
+    parser.add_argument('--once', action='store_true',
+                        help='run a single scan/add cycle and exit (for cron or systemd timers)')
+    args = parser.parse_args()
+
     load_dotenv()
     configure_logging()
 
+    # 依赖在解析参数后才导入，浏览器（DrissionPage）只在需要登录时才导入和启动
+    from byr.bot import Bot
+    from byr.client.pool import create_client
+    from byr.login import LoginTool
+
     login = LoginTool()
-    qbittorrent = QBittorrent()
+    # 单次运行时 qBittorrent 登录与站点会话恢复并行进行；配置了多个客户端时返回客户端池
+    qbittorrent = create_client(connect=not args.once)
     with Bot(login, qbittorrent) as bot:
-        bot.start()
\ No newline at end of file
+        logger.info('Startup took %.2fs', time.perf_counter() - _started)
+        if not args.once:
+            bot.start()
+            return 0
+        ok = bot.run_once()
+    logger.info('Single run %s in %.2fs', 'finished' if ok else 'failed', time.perf_counter() - _started)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
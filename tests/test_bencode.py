@@ -0,0 +1,84 @@
+import pytest
+
+from byr.bencode import BencodeError, encode, parse_torrent
+
+PIECE = b'\x00' * 20
+ROOT = b'\x11' * 32
+
+
+def _torrent(info, comment='https://byr.pt/details.php?id=1'):
+    return encode({'announce': 'https://tracker.byr.pt/announce', 'comment': comment, 'info': info})
+
+
+def _v1_files():
+    return [
+        {'length': 3000, 'path': ['a.mkv']},
+        # 混合种子中按分片对齐插入的填充文件，不占用实际空间
+        {'attr': 'p', 'length': 12384, 'path': ['.pad', '12384']},
+        {'length': 500, 'path': ['b.nfo']},
+    ]
+
+
+def _file_tree():
+    return {
+        'a.mkv': {'': {'length': 3000, 'pieces root': ROOT}},
+        'b.nfo': {'': {'length': 500, 'pieces root': ROOT}},
+    }
+
+
+def test_single_file_v1():
+    # info 的原始字节：infohash 必须按这段字节计算，不能重新编码
+    info = b'd6:lengthi1048576e4:name8:demo.iso12:piece lengthi262144e6:pieces20:' + PIECE + b'e'
+    meta = parse_torrent(b'd7:comment9:byr/123454:info' + info + b'e')
+    assert meta.info_hash_v1 == 'b2d4123a4164ade9b48ceb281e2cd8d777c2a674'
+    assert meta.info_hash_v2 is None
+    assert meta.hash == meta.info_hash_v1
+    assert meta.total_size == 1048576
+    assert meta.name == 'demo.iso'
+    assert meta.comment == 'byr/12345'
+
+
+def test_infohash_uses_original_key_order():
+    # 键未排序的 info 字典重新编码后哈希会变化，qBittorrent 使用的是原始字节
+    info = b'd4:name8:demo.iso6:lengthi1048576e12:piece lengthi262144e6:pieces20:' + PIECE + b'e'
+    meta = parse_torrent(b'd4:info' + info + b'e')
+    assert meta.info_hash_v1 == 'e7fbee92460967ec95901b82c0adade2874003af'
+    assert meta.info_hash_v1 != 'b2d4123a4164ade9b48ceb281e2cd8d777c2a674'  # 排序后重新编码的哈希
+
+
+def test_multi_file_v1_skips_pad_files():
+    info = {'files': _v1_files(), 'name': 'pack', 'piece length': 16384, 'pieces': PIECE}
+    meta = parse_torrent(_torrent(info))
+    assert meta.total_size == 3500
+    assert meta.info_hash_v1 == '0105d67eced66753ba0330bc8b181efe6c5db494'
+
+
+def test_hybrid_v1_v2():
+    info = {'file tree': _file_tree(), 'files': _v1_files(), 'meta version': 2, 'name': 'pack',
+            'piece length': 16384, 'pieces': PIECE}
+    meta = parse_torrent(_torrent(info))
+    assert meta.total_size == 3500
+    assert meta.info_hash_v1 == 'de7e6ca537af4dc104a2940816363090336081ed'
+    assert meta.info_hash_v2 == 'e77750089bce0da465fa0dc584821363e804b42de23271ab7bdd41118bb7b2fe'
+    # 混合种子在 qBittorrent 中以 v1 哈希标识
+    assert meta.hash == meta.info_hash_v1
+
+
+def test_pure_v2():
+    info = {'file tree': _file_tree(), 'meta version': 2, 'name': 'pack', 'piece length': 16384}
+    meta = parse_torrent(_torrent(info))
+    assert meta.total_size == 3500
+    assert meta.info_hash_v1 is None
+    assert meta.info_hash_v2 == '90d753c45bd30f4db4aafdeb41917ec330e9e1949743a5ed7e9265dc8c7758b6'
+    assert meta.hash == '90d753c45bd30f4db4aafdeb41917ec330e9e194'
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'd4:infoi1ee',
+    b'd4:infod4:name1:xee',
+    b'd4:infod6:pieces20:' + PIECE,
+])
+def test_invalid_torrents(data):
+    with pytest.raises(BencodeError):
+        parse_torrent(data)
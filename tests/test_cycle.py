@@ -0,0 +1,83 @@
+from bench.fake_qbittorrent import FakeQBittorrent
+from bench.fake_site import FakeSite
+from byr.bot import Bot
+from byr.client.qbittorrent import QBittorrent
+
+
+class _Login:
+    """用模拟站点的 Cookie 代替浏览器登录的 LoginTool 替身"""
+    browser = None
+    tab = None
+    logout_url = ''
+
+    def __init__(self, site):
+        self.site = site
+        self.logins = 0
+
+    def login(self):
+        self.logins += 1
+        return object()
+
+    def retry_login(self):
+        return self.login()
+
+    def get_cookies(self):
+        return self.site.cookies
+
+    def logout(self):
+        return True
+
+    def close(self):
+        pass
+
+    def clear_browser(self):
+        pass
+
+
+def _bot(site, login):
+    bot = Bot(login, QBittorrent(connect=False))
+    bot.base_url = site.url
+    bot.torrent_url = bot._get_url('torrents.php')
+    bot.scanner.base_url = site.url
+    bot.scanner.max_pages = len(site.pages)
+    return bot
+
+
+def test_login_scan_and_add(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FakeQBittorrent() as fake, FakeSite(rows=50, require_login=True) as site:
+        fake.seed(20, completed_ratio=1.0)
+        existing = set(fake.torrents)
+        monkeypatch.setenv('QBITTORRENT_HOST', fake.url)
+        monkeypatch.setenv('QBITTORRENT_USERNAME', fake.username)
+        monkeypatch.setenv('QBITTORRENT_PASSWORD', fake.password)
+        monkeypatch.setenv('MAX_TORRENTS_SIZE', str(fake.capacity // 1024 ** 3))
+        monkeypatch.setenv('SCAN_MODE', 'http')
+        monkeypatch.delenv('METRICS_PORT', raising=False)
+
+        login = _Login(site)
+        bot = _bot(site, login)
+        try:
+            assert bot.run_once()
+        finally:
+            bot.__exit__(None, None, None)
+
+        # 没有保存的会话，通过登录工具取得 Cookie 后才能访问列表页和下载种子
+        assert login.logins == 1
+        assert site.calls['/torrents.php'] >= 1
+        assert site.calls['/download.php'] >= 1
+        added = set(fake.torrents) - existing
+        assert added
+        assert set(bot.seen.added_hashes()) <= set(fake.torrents)
+        # 客户端有空余的下载名额，排队的任务已开始
+        assert any(fake.torrents[h]['state'] != 'pausedDL' for h in added)
+
+        # 再次运行时从保存的 Cookie 恢复会话，不再登录
+        site.refresh()
+        bot = _bot(site, login)
+        try:
+            assert bot.run_once()
+        finally:
+            bot.__exit__(None, None, None)
+        assert login.logins == 1
+        assert site.calls['/login.php'] == 0
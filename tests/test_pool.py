@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from bench.fake_qbittorrent import FakeQBittorrent
+from bench.fake_site import FakeSite
+from byr.admission import SpaceBudget
+from byr.bot import Bot
+from byr.client.pool import create_client
+
+
+class _Login:
+    """不需要登录的 LoginTool 替身"""
+    browser = None
+    tab = None
+    logout_url = ''
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool_bot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FakeQBittorrent() as first, FakeQBittorrent() as second, FakeSite(rows=20, promo_ratio=1.0) as site:
+        for suffix, fake in (('', first), ('_2', second)):
+            fake.seed(5, completed_ratio=1.0)
+            monkeypatch.setenv(f'QBITTORRENT_HOST{suffix}', fake.url)
+        monkeypatch.setenv('QBITTORRENT_USERNAME', first.username)
+        monkeypatch.setenv('QBITTORRENT_PASSWORD', first.password)
+        monkeypatch.setenv('MAX_TORRENTS_SIZE', str(first.capacity // 1024 ** 3))
+        monkeypatch.delenv('METRICS_PORT', raising=False)
+
+        bot = Bot(_Login(), create_client(connect=False))
+        bot._fetch_torrent = lambda torrent_id, url='': site.torrent(torrent_id)
+        try:
+            yield bot, site, (first, second)
+        finally:
+            bot.__exit__(None, None, None)
+
+
+def _download(bot, seed_id):
+    async def run():
+        budget = SpaceBudget(bot.torrent_client.get_headroom())
+        return await bot.download(seed_id, budget), budget
+    return asyncio.run(run())
+
+
+def test_failed_add_releases_the_assigned_shard(pool_bot):
+    bot, site, _ = pool_bot
+    pool = bot.torrent_client
+
+    def fail(items):
+        raise RuntimeError('client went away')
+
+    bot._adds.func = fail
+    headroom = {shard: pool.choose(0)[1] for shard in pool.shards}
+    with pytest.raises(RuntimeError):
+        _download(bot, site.listings[0].seed_id)
+
+    # 没有添加成功的种子不再占用选定客户端的余量
+    assert pool._assigned == {}
+    assert {shard: pool.choose(0)[1] for shard in pool.shards} == headroom
+
+
+def test_added_torrent_goes_to_the_assigned_shard(pool_bot):
+    bot, site, fakes = pool_bot
+    pool = bot.torrent_client
+    before = [set(fake.torrents) for fake in fakes]
+
+    ok, budget = _download(bot, site.listings[0].seed_id)
+    assert ok
+    assert pool._assigned == {}
+    assert budget.reserved == 0
+    added = [set(fake.torrents) - hashes for fake, hashes in zip(fakes, before, strict=True)]
+    assert sorted(len(hashes) for hashes in added) == [0, 1]
@@ -0,0 +1,56 @@
+import itertools
+import random
+
+import pytest
+
+from byr.models import Promo, TorrentListing
+from byr.ranking import GIB, TorrentRanker
+
+
+def _listing(rng, seed_id):
+    return TorrentListing(
+        seed_id=str(seed_id),
+        title=f'torrent-{seed_id}',
+        cat='',
+        promo=rng.choice([Promo.FREE, Promo.TWOUP_FREE]),
+        # 整数 GiB 且容量不超过 256 GiB 时背包的份数划分没有取整误差，可与按实际大小的穷举直接比较
+        size=rng.randint(1, 60) * GIB,
+        seeding=rng.randint(0, 50),
+        downloading=rng.randint(0, 200),
+        finished=0,
+        is_hot=rng.random() < 0.2,
+        is_new=rng.random() < 0.3,
+    )
+
+
+def _brute_force(ranker, listings, capacity):
+    best = 0.0
+    for count in range(1, ranker.max_count + 1):
+        for combo in itertools.combinations(listings, count):
+            if sum(listing.size for listing in combo) <= capacity:
+                best = max(best, sum(ranker.score(listing) for listing in combo))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_select_matches_brute_force(seed):
+    rng = random.Random(seed)
+    ranker = TorrentRanker(max_count=rng.randint(1, 5))
+    listings = [_listing(rng, i) for i in range(rng.randint(1, 10))]
+    capacity = rng.randint(0, 256) * GIB
+
+    chosen = ranker.select(listings, capacity)
+
+    assert len(chosen) <= ranker.max_count
+    assert sum(listing.size for listing in chosen) <= capacity
+    assert sum(ranker.score(listing) for listing in chosen) == pytest.approx(_brute_force(ranker, listings, capacity))
+
+
+def test_select_without_capacity_takes_top_scores():
+    rng = random.Random(0)
+    ranker = TorrentRanker(max_count=3)
+    listings = [_listing(rng, i) for i in range(8)]
+
+    chosen = ranker.select(listings, None)
+
+    assert chosen == sorted(listings, key=ranker.score, reverse=True)[:3]
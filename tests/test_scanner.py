@@ -0,0 +1,71 @@
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bench.fixtures import make_torrents_page
+from byr.scanner import Scanner
+
+
+class _Site:
+    """按 URL 中的 cat、page 参数返回生成页面的 SiteSession 替身"""
+
+    def __init__(self, pages):
+        self.pages = pages  # {cat: [html, ...]}，cat 为 None 表示不分类
+        self.calls = Counter()
+
+    def get_html(self, url):
+        query = {k: v[-1] for k, v in parse_qs(urlsplit(url).query).items()}
+        category, page = query.get('cat'), int(query.get('page', 0))
+        self.calls[category] += 1
+        return self.pages[category][page]
+
+
+def _pages(count, promo_ratio=0.3, first_id=400000):
+    return [make_torrents_page(rows=50, promo_ratio=promo_ratio, first_id=first_id - i * 50, seed=i)
+            for i in range(count)]
+
+
+@pytest.fixture
+def scanner_for():
+    scanners = []
+
+    def build(site, seen, **kwargs):
+        scanner = Scanner(site, 'http://site/', is_seen=lambda listing: listing.seed_id in seen, **kwargs)
+        scanners.append(scanner)
+        return scanner
+
+    yield build
+    for scanner in scanners:
+        scanner.close()
+
+
+def test_stops_after_first_page_when_it_has_seen_ids(scanner_for):
+    site = _Site({None: _pages(3)})
+    scanner = scanner_for(site, seen=set(), max_pages=3)
+    _, listings = scanner.scan()
+    assert site.calls[None] == 3
+
+    # 所有种子都已处理过时每次扫描只请求第一页
+    seen = {listing.seed_id for listing in listings}
+    scanner = scanner_for(site, seen=seen, max_pages=3)
+    for _ in range(3):
+        scanner.scan()
+    assert site.calls[None] == 3 + 3
+
+
+def test_page_without_promos_does_not_stop_the_scan(scanner_for):
+    pages = _pages(3)
+    pages[0] = make_torrents_page(rows=50, promo_ratio=0.0)
+    site = _Site({None: pages})
+    _, listings = scanner_for(site, seen=set(), max_pages=3).scan()
+    assert site.calls[None] == 3
+    assert listings
+
+
+def test_scans_categories_independently(scanner_for):
+    site = _Site({'401': _pages(3), '402': _pages(3, first_id=300000)})
+    seen = {listing.seed_id for listing in scanner_for(site, seen=set(), categories=['401']).scan()[1]}
+    site.calls.clear()
+    scanner_for(site, seen=seen, max_pages=3, categories=['401', '402']).scan()
+    assert site.calls == {'401': 1, '402': 3}
@@ -0,0 +1,46 @@
+import time
+
+from byr.seen import SeenIndex
+
+
+def _rows(seen):
+    return {seed_id: (outcome, cat) for seed_id, outcome, cat in
+            seen._conn.execute('SELECT seed_id, outcome, cat FROM seen')}
+
+
+def test_expired_entries_are_purged_while_running(tmp_path, monkeypatch):
+    seen = SeenIndex(path=str(tmp_path / 'seen.db'), ttl_days=1, purge_interval=60)
+    try:
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now)
+        seen.record('1', 'added', infohash='a' * 40, promo='free', cat='401')
+        assert '1' in seen and seen.cat_of('a' * 40) == '401'
+
+        # 一天后写入新记录时清除过期的记录，无需重启
+        now += 86400 + 120
+        seen.record('2', 'added', infohash='b' * 40, promo='free', cat='402')
+        assert '1' not in seen
+        assert seen.cat_of('a' * 40) == ''
+        assert seen.added_hashes() == ['b' * 40]
+        assert set(_rows(seen)) == {'2'}
+    finally:
+        seen.close()
+
+
+def test_cat_is_stored_for_every_outcome(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    seen = SeenIndex(path=path)
+    seen.record('1', 'failed', promo='free', cat='401')
+    seen.record('2', 'invalid', promo='free', cat='402')
+    seen.record('3', 'added', infohash='c' * 40, promo='free', cat='403')
+    rows = _rows(seen)
+    seen.close()
+    assert rows == {'1': ('failed', '401'), '2': ('invalid', '402'), '3': ('added', '403')}
+
+    # 重新加载后分类仍可按 infohash 查询
+    seen = SeenIndex(path=path)
+    try:
+        assert seen.cat_of('c' * 40) == '403'
+        assert seen.outcome('1') == 'failed'
+    finally:
+        seen.close()
@@ -0,0 +1,41 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from byr.session import SiteSession, TransientError
+
+
+class _Truncated(BaseHTTPRequestHandler):
+    """声明的长度比实际发送的多，发送一部分后断开连接"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-bittorrent')
+        self.send_header('Content-Length', '4096')
+        self.end_headers()
+        self.wfile.write(b'd8:announce')
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def truncating_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Truncated)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/download.php?id=1'
+    server.shutdown()
+    server.server_close()
+
+
+def test_dropped_body_is_transient(truncating_server):
+    site = SiteSession('test', timeout=5)
+    try:
+        with pytest.raises(TransientError):
+            site.fetch_torrent(truncating_server)
+    finally:
+        site.close()